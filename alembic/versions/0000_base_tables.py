@@ -0,0 +1,77 @@
+"""Base users, watch_history and favorites tables
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-17
+
+The tables the app created with create_all before migrations existed,
+as they were then. Databases that already have them are left alone, so
+`alembic upgrade head` works both on an empty database and on one the
+app has already started against.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0000"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_superuser", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_users_id", "users", ["id"], if_not_exists=True)
+    for column in ("email", "username"):
+        op.create_index(
+            f"ix_users_{column}", "users", [column], unique=True, if_not_exists=True
+        )
+
+    op.create_table(
+        "watch_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("movie_slug", sa.String(), nullable=False),
+        sa.Column("movie_name", sa.String(), nullable=False),
+        sa.Column("episode_slug", sa.String(), nullable=True),
+        sa.Column("episode_name", sa.String(), nullable=True),
+        sa.Column("progress", sa.Float(), nullable=True),
+        sa.Column("last_watched", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    for column in ("id", "movie_slug"):
+        op.create_index(
+            f"ix_watch_history_{column}", "watch_history", [column], if_not_exists=True
+        )
+
+    op.create_table(
+        "favorites",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("movie_slug", sa.String(), nullable=False),
+        sa.Column("movie_name", sa.String(), nullable=False),
+        sa.Column("poster_url", sa.String(), nullable=True),
+        sa.Column("added_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    for column in ("id", "movie_slug"):
+        op.create_index(
+            f"ix_favorites_{column}", "favorites", [column], if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    for table in ("favorites", "watch_history", "users"):
+        op.drop_table(table, if_exists=True)
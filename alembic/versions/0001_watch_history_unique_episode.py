@@ -0,0 +1,51 @@
+"""Unique (user_id, movie_slug, episode) key on watch_history
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-17
+
+Adds what create_all can't retrofit onto an existing table: duplicate
+progress rows are collapsed (keeping the most recently watched one) and
+the unique index used as the upsert conflict target is created.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = "0000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM watch_history WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, movie_slug, COALESCE(episode_slug, '')
+                    ORDER BY last_watched DESC, id DESC
+                ) AS rn
+                FROM watch_history
+            ) ranked
+            WHERE rn > 1
+        )
+        """
+    )
+    op.create_index(
+        "ux_watch_history_user_movie_episode",
+        "watch_history",
+        ["user_id", "movie_slug", sa.text("coalesce(episode_slug, '')")],
+        unique=True,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ux_watch_history_user_movie_episode",
+        table_name="watch_history",
+        if_exists=True,
+    )
@@ -0,0 +1,40 @@
+"""Composite indexes for keyset pagination of history and favorites
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_watch_history_user_last_watched",
+        "watch_history",
+        ["user_id", "last_watched"],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_favorites_user_added_at",
+        "favorites",
+        ["user_id", "added_at"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_favorites_user_added_at", table_name="favorites", if_exists=True)
+    op.drop_index(
+        "ix_watch_history_user_last_watched",
+        table_name="watch_history",
+        if_exists=True,
+    )
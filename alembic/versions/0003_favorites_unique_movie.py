@@ -0,0 +1,39 @@
+"""Unique (user_id, movie_slug) key on favorites
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Collapses duplicate favorites (keeping the earliest) before adding the
+unique index that bulk adds use as their ON CONFLICT target.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM favorites WHERE id NOT IN (
+            SELECT MIN(id) FROM favorites GROUP BY user_id, movie_slug
+        )
+        """
+    )
+    op.create_index(
+        "ux_favorites_user_movie",
+        "favorites",
+        ["user_id", "movie_slug"],
+        unique=True,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_favorites_user_movie", table_name="favorites", if_exists=True)
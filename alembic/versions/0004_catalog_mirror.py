@@ -0,0 +1,123 @@
+"""Local catalog mirror tables
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Movies, episodes, categories and countries mirrored from KKPhim by
+app/services/catalog_sync.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _term_table(name: str) -> None:
+    op.create_table(
+        name,
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("slug", sa.String(), nullable=False, unique=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("external_id", sa.String(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index(f"ix_{name}_id", name, ["id"], if_not_exists=True)
+
+
+def _link_table(name: str, column: str, target: str) -> None:
+    op.create_table(
+        name,
+        sa.Column(
+            "movie_id",
+            sa.Integer(),
+            sa.ForeignKey("movies.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            column,
+            sa.Integer(),
+            sa.ForeignKey(f"{target}.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        if_not_exists=True,
+    )
+    op.create_index(f"ix_{name}_{column}", name, [column], if_not_exists=True)
+
+
+def upgrade() -> None:
+    _term_table("categories")
+    _term_table("countries")
+
+    op.create_table(
+        "movies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("slug", sa.String(), nullable=False, unique=True),
+        sa.Column("external_id", sa.String(), nullable=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("origin_name", sa.String(), nullable=True),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.Column("quality", sa.String(), nullable=True),
+        sa.Column("lang", sa.String(), nullable=True),
+        sa.Column("year", sa.Integer(), nullable=True),
+        sa.Column("time", sa.String(), nullable=True),
+        sa.Column("episode_current", sa.String(), nullable=True),
+        sa.Column("episode_total", sa.String(), nullable=True),
+        sa.Column("poster_url", sa.String(), nullable=True),
+        sa.Column("thumb_url", sa.String(), nullable=True),
+        sa.Column("view", sa.Integer(), nullable=True),
+        sa.Column("actor", sa.JSON(), nullable=True),
+        sa.Column("director", sa.JSON(), nullable=True),
+        sa.Column("modified", sa.DateTime(), nullable=True),
+        sa.Column("synced_at", sa.DateTime(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=False),
+        if_not_exists=True,
+    )
+    for column in ("id", "type", "year", "modified"):
+        op.create_index(f"ix_movies_{column}", "movies", [column], if_not_exists=True)
+
+    op.create_table(
+        "episodes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "movie_id",
+            sa.Integer(),
+            sa.ForeignKey("movies.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("server_name", sa.String(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("slug", sa.String(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=True),
+        sa.Column("link_embed", sa.String(), nullable=True),
+        sa.Column("link_m3u8", sa.String(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_episodes_id", "episodes", ["id"], if_not_exists=True)
+    op.create_index(
+        "ix_episodes_movie_position",
+        "episodes",
+        ["movie_id", "position"],
+        if_not_exists=True,
+    )
+
+    _link_table("movie_categories", "category_id", "categories")
+    _link_table("movie_countries", "country_id", "countries")
+
+
+def downgrade() -> None:
+    for table in (
+        "movie_countries",
+        "movie_categories",
+        "episodes",
+        "movies",
+        "countries",
+        "categories",
+    ):
+        op.drop_table(table, if_exists=True)
@@ -0,0 +1,36 @@
+"""Precomputed related titles
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Filled by app/services/related_titles.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "movie_related",
+        sa.Column(
+            "movie_id",
+            sa.Integer(),
+            sa.ForeignKey("movies.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("items", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("movie_related", if_exists=True)
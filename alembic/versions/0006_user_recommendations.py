@@ -0,0 +1,36 @@
+"""Precomputed user recommendations
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+Filled by app/services/recommendations.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_recommendations",
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("items", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_recommendations", if_exists=True)
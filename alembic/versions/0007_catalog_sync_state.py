@@ -0,0 +1,31 @@
+"""Catalog sync coverage marker
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+Records when app/services/catalog_sync.py last walked the whole catalog,
+so mirrored listings are only served once the mirror is complete.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalog_sync_state",
+        sa.Column("list_slug", sa.String(), primary_key=True),
+        sa.Column("full_synced_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("catalog_sync_state", if_exists=True)
@@ -1,28 +1,62 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Optional
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.security.utils import get_authorization_scheme_param
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
-from app.database import SessionLocal
+from app.database import AsyncSessionLocal
 from app.config import settings
 from app.models.user import User
+from app.core.cache import LocalCache
 from app.core.security import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/login")
 
+# Resolved users keyed by token `sub`, so authenticated requests skip the
+# users SELECT. Entries are dropped when the profile changes; other workers
+# see changes once PRINCIPAL_CACHE_TTL runs out.
+principal_cache = LocalCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES)
 
-def get_db() -> Generator:
+
+def cache_principal(user: User):
+    snapshot = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+    principal_cache.set(str(user.id), snapshot, 0, settings.PRINCIPAL_CACHE_TTL)
+
+
+def invalidate_principal(user_id: int):
+    principal_cache.delete(str(user_id))
+
+
+def _cached_principal(user_id) -> Optional[User]:
+    """Rebuild a detached User from the cache without touching the DB"""
+    snapshot = principal_cache.get(str(user_id))
+    if snapshot is None:
+        return None
+
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+async def _load_principal(db: AsyncSession, user_id) -> Optional[User]:
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalars().first()
+    if user is not None:
+        cache_principal(user)
+    return user
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Database session dependency"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
@@ -39,7 +73,13 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = _cached_principal(user_id)
+    if user is not None:
+        # Attach to this request's session so handlers can update it
+        db.add(user)
+        return user
+
+    user = await _load_principal(db, user_id)
     if user is None:
         raise credentials_exception
 
@@ -55,12 +95,15 @@ async def get_current_active_user(
     return current_user
 
 
-def get_optional_user(
-    request: Request, db: Session = Depends(get_db) 
-) -> Optional[User]:
-    """Get user if token provided, otherwise return None (for public endpoints)"""
-    token = request.headers.get("authorization")
-    if not token:
+async def get_optional_user(request: Request) -> Optional[User]:
+    """
+    Get user if token provided, otherwise return None (for public endpoints).
+
+    No DB session is opened unless a bearer token is sent and the user is
+    not already in the principal cache.
+    """
+    scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+    if scheme.lower() != "bearer" or not token:
         return None
 
     try:
@@ -72,7 +115,11 @@ def get_optional_user(
         if user_id is None:
             return None
 
-        user = db.query(User).filter(User.id == user_id).first()
-        return user
+        user = _cached_principal(user_id)
+        if user is not None:
+            return user
+
+        async with AsyncSessionLocal() as db:
+            return await _load_principal(db, user_id)
     except:
         return None
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Request
+from typing import Optional
+
+from app.api.deps import get_optional_user
+from app.core.http_cache import cached_response
+from app.models.user import User
+from app.services.home_service import get_home_feed
+
+router = APIRouter()
+
+
+@router.get("")
+async def get_home(
+    request: Request,
+    user: Optional[User] = Depends(get_optional_user),
+):
+    """Hero, catalog sections and (signed in) continue watching in one call"""
+    feed = await get_home_feed(user.id if user else None)
+
+    # Anonymous feeds are shared; a signed-in feed includes the user's history
+    response = cached_response(
+        request,
+        feed,
+        {"success": True, **feed},
+        private=user is not None or feed.etag is None,
+    )
+    response.headers.add_vary_header("Authorization")
+    return response
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import Optional
-from sqlalchemy.orm import Session
+import math
 
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from typing import List, Optional
+
+from app.config import settings
 from app.services.kkphim_service import kkphim_service
+from app.services.search_index import search_index
 from app.api.deps import get_db, get_optional_user
+from app.core.http_cache import cached_response
 from app.models.user import User
 
 router = APIRouter()
@@ -11,6 +15,7 @@ router = APIRouter()
 
 @router.get("/new")
 async def get_new_movies(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
 ):
@@ -20,15 +25,20 @@ async def get_new_movies(
     if not result or result.get("status") != True:
         raise HTTPException(status_code=404, detail="No movies found")
 
-    return {
-        "success": True,
-        "data": result.get("items", []),
-        "pagination": result.get("pagination", {}),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("items", []),
+            "pagination": result.get("pagination", {}),
+        },
+    )
 
 
 @router.get("/movies")
 async def get_movies(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
 ):
@@ -38,15 +48,20 @@ async def get_movies(
     if not result or result.get("status") != True:
         raise HTTPException(status_code=404, detail="No movies found")
 
-    return {
-        "success": True,
-        "data": result.get("data", []).get("items", []),
-        "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("data", []).get("items", []),
+            "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
+        },
+    )
 
 
 @router.get("/series")
 async def get_series(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
 ):
@@ -56,14 +71,19 @@ async def get_series(
     if not result or result.get("status") != True:
         raise HTTPException(status_code=404, detail="No series found")
 
-    return {
-        "success": True,
-        "data": result.get("data", []).get("items", []),
-        "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("data", []).get("items", []),
+            "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
+        },
+    )
 
 @router.get("/tv-shows")
 async def get_tv_shows(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
 ):
@@ -73,14 +93,19 @@ async def get_tv_shows(
     if not result or result.get("status") != True:
         raise HTTPException(status_code=404, detail="No TV shows found")
 
-    return {
-        "success": True,
-        "data": result.get("data", []).get("items", []),
-        "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("data", []).get("items", []),
+            "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
+        },
+    )
 
 @router.get("/anime")
-async def get_anime(    
+async def get_anime(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
 ):
@@ -90,25 +115,121 @@ async def get_anime(
     if not result or result.get("status") != True:
         raise HTTPException(status_code=404, detail="No anime found")
 
-    return {
-        "success": True,
-        "data": result.get("data", []).get("items", []),
-        "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("data", []).get("items", []),
+            "pagination": result.get("data", []).get("params", {}).get("pagination", {}),
+        },
+    )
 
 @router.get("/countries")
-async def get_nation(user: Optional[User] = Depends(get_optional_user)):
+async def get_nation(
+    request: Request,
+    user: Optional[User] = Depends(get_optional_user),
+):
     """Get all countries"""
     result = await kkphim_service.get_countries()
 
     if not result:
         raise HTTPException(status_code=404, detail="No countries found")
     
-    return {"success": True, "data": result}
+    return cached_response(request, result, {"success": True, "data": result})
+
+
+@router.get("/filter")
+async def filter_movies(
+    request: Request,
+    category: Optional[List[str]] = Query(None, description="Category slugs (any of)"),
+    country: Optional[List[str]] = Query(None, description="Country slugs (any of)"),
+    type: Optional[List[str]] = Query(
+        None, description="single, series, tvshows or hoathinh (any of)"
+    ),
+    quality: Optional[List[str]] = Query(None, description="Quality (any of)"),
+    year_from: Optional[int] = Query(None, ge=1900, description="First year"),
+    year_to: Optional[int] = Query(None, ge=1900, description="Last year"),
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(20, ge=1, le=64, description="Items per page"),
+    user: Optional[User] = Depends(get_optional_user),
+):
+    """
+    Filter by any combination of category, country, type, quality and year
+    range, with per-facet counts. Answered from the local catalog mirror;
+    without it only a single category, country or year can be filtered
+    (one upstream listing, no facet counts).
+    """
+    if settings.CATALOG_MIRROR_ENABLED:
+        await search_index.refresh()
+        if len(search_index.filters):
+            found = search_index.filters.filter(
+                {
+                    "category": category,
+                    "country": country,
+                    "type": type,
+                    "quality": quality,
+                },
+                year_from=year_from,
+                year_to=year_to,
+                page=page,
+                limit=limit,
+            )
+            return {
+                "success": True,
+                "data": found["items"],
+                "pagination": {
+                    "totalItems": found["total"],
+                    "totalItemsPerPage": limit,
+                    "currentPage": page,
+                    "totalPages": math.ceil(found["total"] / limit),
+                },
+                "facets": found["facets"],
+            }
+
+    single = [
+        name
+        for name, value in (
+            ("category", category),
+            ("country", country),
+            ("type", type),
+            ("quality", quality),
+            ("year", year_from is not None or year_to is not None),
+        )
+        if value
+    ]
+    result = None
+    if single == ["category"] and len(category) == 1:
+        result = await kkphim_service.get_by_category(category[0], page, limit)
+    elif single == ["country"] and len(country) == 1:
+        result = await kkphim_service.get_by_country(country[0], page, limit)
+    elif single == ["year"] and year_from is not None and year_from == year_to:
+        result = await kkphim_service.get_by_year(year_from, page, limit)
+    else:
+        raise HTTPException(
+            status_code=503, detail="Combined filters need the catalog mirror"
+        )
+
+    if not result or result.get("status") != True:
+        raise HTTPException(status_code=404, detail="No movies found")
+
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("data", {}).get("items", []),
+            "pagination": result.get("data", {}).get("params", {}).get("pagination", {}),
+            "facets": {},
+        },
+    )
+
 
 @router.get("/{slug}")
 async def get_movie_detail(
-    slug: str, user: Optional[User] = Depends(get_optional_user)
+    request: Request,
+    slug: str,
+    user: Optional[User] = Depends(get_optional_user),
 ):
     """Get movie details by slug"""
     result = await kkphim_service.get_movie_detail(slug=slug)
@@ -116,11 +237,36 @@ async def get_movie_detail(
     if not result or not result.get("movie"):
         raise HTTPException(status_code=404, detail="Movie not found")
 
-    return {"success": True, "data": result.get("movie"), "episodes": result.get("episodes", [])}
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("movie"),
+            "episodes": result.get("episodes", []),
+        },
+    )
+
+
+@router.get("/{slug}/related")
+async def get_related_movies(
+    slug: str,
+    limit: int = Query(
+        settings.RELATED_TOP_K, ge=1, le=settings.RELATED_TOP_K, description="Titles"
+    ),
+    user: Optional[User] = Depends(get_optional_user),
+):
+    """Related titles precomputed from the catalog mirror"""
+    related = await kkphim_service.get_related(slug)
+    if not related:
+        raise HTTPException(status_code=404, detail="No related movies found")
+
+    return {"success": True, "data": related[:limit]}
 
 
 @router.get("/category/{category_slug}")
 async def get_movies_by_category(
+    request: Request,
     category_slug: str,
     page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
@@ -132,11 +278,15 @@ async def get_movies_by_category(
     if not result or result.get("status") != True:
         raise HTTPException(status_code=404, detail="No movies found in this category")
 
-    return {
-        "success": True,
-        "data": result.get("data", []).get("items", []),
-        "pagination": result.get("data", []).get("pagination", {}),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "data": result.get("data", []).get("items", []),
+            "pagination": result.get("data", []).get("pagination", {}),
+        },
+    )
 
 @router.get("/convert-img")
 async def convert_image_url(
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from typing import Optional
 
+from app.config import settings
 from app.services.kkphim_service import kkphim_service
+from app.services.search_index import search_index
 from app.api.deps import get_optional_user
+from app.core.http_cache import cached_response
 from app.models.user import User
 
 router = APIRouter()
@@ -10,22 +13,70 @@ router = APIRouter()
 
 @router.get("/")
 async def search_movies(
+    request: Request,
     keyword: str = Query(..., min_length=1, description="Search keyword"),
     limit: int = Query(10, ge=1, le=50, description="Number of results"),
+    page: int = Query(1, ge=1, description="Page number"),
     user: Optional[User] = Depends(get_optional_user),
 ):
-    """Search for movies and series"""
+    """
+    Search for movies and series.
+
+    With the catalog mirror enabled the local index answers (accent- and
+    case-insensitive, ranked); otherwise the query goes upstream.
+    """
     if not keyword or len(keyword.strip()) == 0:
         raise HTTPException(status_code=400, detail="Search keyword is required")
 
-    result = await kkphim_service.search(keyword=keyword.strip(), limit=limit)
+    if settings.CATALOG_MIRROR_ENABLED:
+        await search_index.refresh()
+        if len(search_index):
+            found = search_index.search(keyword, page=page, limit=limit)
+            if not found["items"]:
+                raise HTTPException(status_code=404, detail="No results found")
+            return {
+                "success": True,
+                "keyword": keyword,
+                "data": found["items"],
+                "total": found["total"],
+                "page": page,
+            }
+
+    result = await kkphim_service.search(
+        keyword=keyword.strip(), page=page, limit=limit
+    )
 
     if not result:
         raise HTTPException(status_code=404, detail="No results found")
 
-    return {
-        "success": True,
-        "keyword": keyword,
-        "data": result.get("items", []),
-        "total": len(result.get("items", [])),
-    }
+    return cached_response(
+        request,
+        result,
+        {
+            "success": True,
+            "keyword": keyword,
+            "data": result.get("items", []),
+            "total": len(result.get("items", [])),
+        },
+    )
+
+
+@router.get("/suggest")
+async def suggest_titles(
+    q: str = Query(..., min_length=1, description="Typed prefix"),
+    limit: int = Query(
+        settings.SUGGEST_TOP_K,
+        ge=1,
+        le=settings.SUGGEST_TOP_K,
+        description="Number of suggestions",
+    ),
+):
+    """
+    Title completions for the search box, most viewed first. Served from
+    the local catalog mirror only; empty when the mirror is disabled.
+    """
+    suggestions = []
+    if settings.CATALOG_MIRROR_ENABLED:
+        await search_index.refresh()
+        suggestions = search_index.suggestions.suggest(q, limit)
+    return {"success": True, "query": q, "data": suggestions}
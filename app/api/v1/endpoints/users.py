@@ -1,18 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-
-from app.api.deps import get_db, get_current_active_user
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+
+from app.api.deps import get_db, get_current_active_user, invalidate_principal
+from app.database import UPSERT_DIALECTS
+from app.core.pagination import encode_cursor, decode_cursor
 from app.models.user import User
 from app.models.watch_history import WatchHistory
 from app.models.favorite import Favorite
+from app.models.recommendation import UserRecommendation
 from app.schemas.user import UserResponse, UserUpdate
+from app.config import settings
+from app.services.watch_service import upsert_watch_history, progress_buffer
 from app.schemas.watch_history import (
     WatchHistoryCreate,
     WatchHistoryResponse,
     WatchHistoryUpdate,
+    WatchHistoryBulkDelete,
     FavoriteCreate,
     FavoriteResponse,
+    FavoriteBulkCreate,
+    FavoriteSlugs,
 )
 
 router = APIRouter()
@@ -30,59 +40,107 @@ async def get_current_user_profile(
 async def update_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update current user profile"""
     if user_update.email:
         # Check if email is taken by another user
-        existing = (
-            db.query(User)
-            .filter(User.email == user_update.email, User.id != current_user.id)
-            .first()
+        result = await db.execute(
+            select(User).where(
+                User.email == user_update.email, User.id != current_user.id
+            )
         )
-        if existing:
+        if result.scalars().first():
             raise HTTPException(status_code=400, detail="Email already in use")
         current_user.email = user_update.email
 
     if user_update.username:
         # Check if username is taken by another user
-        existing = (
-            db.query(User)
-            .filter(User.username == user_update.username, User.id != current_user.id)
-            .first()
+        result = await db.execute(
+            select(User).where(
+                User.username == user_update.username, User.id != current_user.id
+            )
         )
-        if existing:
+        if result.scalars().first():
             raise HTTPException(status_code=400, detail="Username already in use")
         current_user.username = user_update.username
 
     if user_update.password:
-        from app.core.security import get_password_hash
+        from app.core.security import get_password_hash_async
 
-        current_user.hashed_password = get_password_hash(user_update.password)
+        current_user.hashed_password = await get_password_hash_async(
+            user_update.password
+        )
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_principal(current_user.id)
+    await db.refresh(current_user)
 
     return current_user
 
 
+@router.get("/me/recommendations")
+async def get_recommendations(
+    limit: int = Query(
+        settings.RECOMMENDATIONS_TOP_N, ge=1, le=settings.RECOMMENDATIONS_TOP_N
+    ),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Titles recommended from the user's history and favorites, each with the
+    title that prompted it ("because"). Precomputed by the recommendations
+    job; empty until it has seen the user.
+    """
+    result = await db.execute(
+        select(UserRecommendation).where(UserRecommendation.user_id == current_user.id)
+    )
+    row = result.scalars().first()
+    return {
+        "success": True,
+        "data": row.items[:limit] if row else [],
+        "computed_at": row.computed_at if row else None,
+    }
+
+
 # Watch History Endpoints
 @router.get("/watch-history", response_model=List[WatchHistoryResponse])
 async def get_watch_history(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Get user's watch history"""
-    history = (
-        db.query(WatchHistory)
-        .filter(WatchHistory.user_id == current_user.id)
-        .order_by(WatchHistory.last_watched.desc())
-        .offset(skip)
+    """
+    Get user's watch history, newest first.
+
+    Pass the X-Next-Cursor response header back as `cursor` for keyset
+    pagination; `skip` is still honoured when no cursor is given.
+    """
+    # Write pending heartbeats first so the list reflects the latest progress
+    await progress_buffer.flush_user(db, current_user.id)
+
+    query = (
+        select(WatchHistory)
+        .where(WatchHistory.user_id == current_user.id)
+        .order_by(WatchHistory.last_watched.desc(), WatchHistory.id.desc())
         .limit(limit)
-        .all()
     )
+    if cursor:
+        last_watched, last_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(WatchHistory.last_watched, WatchHistory.id)
+            < tuple_(last_watched, last_id)
+        )
+    else:
+        query = query.offset(skip)
+
+    history = (await db.execute(query)).scalars().all()
+    if len(history) == limit:
+        last = history[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.last_watched, last.id)
 
     return history
 
@@ -91,79 +149,128 @@ async def get_watch_history(
 async def add_or_update_watch_history(
     history_data: WatchHistoryCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Add or update watch history"""
-    # Check if entry exists
-    existing = (
-        db.query(WatchHistory)
-        .filter(
-            WatchHistory.user_id == current_user.id,
-            WatchHistory.movie_slug == history_data.movie_slug,
-            WatchHistory.episode_slug == history_data.episode_slug,
-        )
-        .first()
-    )
+    return await upsert_watch_history(db, current_user.id, history_data)
 
-    if existing:
-        # Update existing
-        existing.progress = history_data.progress
-        existing.movie_name = history_data.movie_name
-        existing.episode_name = history_data.episode_name
-        from datetime import datetime
-
-        existing.last_watched = datetime.utcnow()
-        db.commit()
-        db.refresh(existing)
-        return existing
+
+@router.put("/watch-history/progress", status_code=status.HTTP_202_ACCEPTED)
+async def save_watch_progress(
+    history_data: WatchHistoryCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Record a player progress heartbeat (written to the DB in batches)"""
+    if not settings.PROGRESS_BUFFER_ENABLED:
+        await upsert_watch_history(db, current_user.id, history_data)
     else:
-        # Create new
-        new_history = WatchHistory(user_id=current_user.id, **history_data.dict())
-        db.add(new_history)
-        db.commit()
-        db.refresh(new_history)
-        return new_history
+        await progress_buffer.add(current_user.id, history_data)
+
+    return {"success": True}
 
 
 @router.delete("/watch-history/{history_id}")
 async def delete_watch_history(
     history_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Delete watch history entry"""
-    history = (
-        db.query(WatchHistory)
-        .filter(WatchHistory.id == history_id, WatchHistory.user_id == current_user.id)
-        .first()
+    # Pending heartbeats would otherwise re-create the row on the next flush
+    await progress_buffer.flush_user(db, current_user.id)
+
+    result = await db.execute(
+        select(WatchHistory).where(
+            WatchHistory.id == history_id, WatchHistory.user_id == current_user.id
+        )
     )
+    history = result.scalars().first()
 
     if not history:
         raise HTTPException(status_code=404, detail="Watch history not found")
 
-    db.delete(history)
-    db.commit()
+    await db.delete(history)
+    await db.commit()
 
     return {"success": True, "message": "Watch history deleted"}
 
 
+@router.delete("/watch-history")
+async def clear_watch_history(
+    movie_slug: Optional[str] = None,
+    before: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete all watch history, or only entries for a movie / older than a date"""
+    await progress_buffer.flush_user(db, current_user.id)
+
+    stmt = delete(WatchHistory).where(WatchHistory.user_id == current_user.id)
+    if movie_slug:
+        stmt = stmt.where(WatchHistory.movie_slug == movie_slug)
+    if before:
+        stmt = stmt.where(WatchHistory.last_watched < before)
+
+    result = await db.execute(stmt)
+    await db.commit()
+
+    return {"success": True, "deleted": result.rowcount}
+
+
+@router.post("/watch-history/bulk-delete")
+async def bulk_delete_watch_history(
+    payload: WatchHistoryBulkDelete,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete several watch history entries by id"""
+    await progress_buffer.flush_user(db, current_user.id)
+
+    result = await db.execute(
+        delete(WatchHistory).where(
+            WatchHistory.user_id == current_user.id,
+            WatchHistory.id.in_(payload.ids),
+        )
+    )
+    await db.commit()
+
+    return {"success": True, "deleted": result.rowcount}
+
+
 # Favorites Endpoints
 @router.get("/favorites", response_model=List[FavoriteResponse])
 async def get_favorites(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Get user's favorite movies"""
-    favorites = (
-        db.query(Favorite)
-        .filter(Favorite.user_id == current_user.id)
-        .order_by(Favorite.added_at.desc())
-        .offset(skip)
+    """
+    Get user's favorite movies, most recently added first.
+
+    Supports the same X-Next-Cursor keyset pagination as watch history.
+    """
+    query = (
+        select(Favorite)
+        .where(Favorite.user_id == current_user.id)
+        .order_by(Favorite.added_at.desc(), Favorite.id.desc())
         .limit(limit)
-        .all()
     )
+    if cursor:
+        added_at, last_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(Favorite.added_at, Favorite.id) < tuple_(added_at, last_id)
+        )
+    else:
+        query = query.offset(skip)
+
+    favorites = (await db.execute(query)).scalars().all()
+    if len(favorites) == limit:
+        last = favorites[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.added_at, last.id)
 
     return favorites
 
@@ -172,26 +279,24 @@ async def get_favorites(
 async def add_favorite(
     favorite_data: FavoriteCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Add movie to favorites"""
     # Check if already favorited
-    existing = (
-        db.query(Favorite)
-        .filter(
+    result = await db.execute(
+        select(Favorite).where(
             Favorite.user_id == current_user.id,
             Favorite.movie_slug == favorite_data.movie_slug,
         )
-        .first()
     )
 
-    if existing:
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Movie already in favorites")
 
     new_favorite = Favorite(user_id=current_user.id, **favorite_data.dict())
     db.add(new_favorite)
-    db.commit()
-    db.refresh(new_favorite)
+    await db.commit()
+    await db.refresh(new_favorite)
 
     return new_favorite
 
@@ -200,35 +305,113 @@ async def add_favorite(
 async def remove_favorite(
     movie_slug: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Remove movie from favorites"""
-    favorite = (
-        db.query(Favorite)
-        .filter(Favorite.user_id == current_user.id, Favorite.movie_slug == movie_slug)
-        .first()
+    result = await db.execute(
+        select(Favorite).where(
+            Favorite.user_id == current_user.id, Favorite.movie_slug == movie_slug
+        )
     )
+    favorite = result.scalars().first()
 
     if not favorite:
         raise HTTPException(status_code=404, detail="Favorite not found")
 
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await db.commit()
 
     return {"success": True, "message": "Removed from favorites"}
 
 
+@router.post("/favorites/bulk")
+async def bulk_add_favorites(
+    payload: FavoriteBulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Add several movies to favorites, skipping ones already there"""
+    rows = {
+        item.movie_slug: {**item.dict(), "user_id": current_user.id}
+        for item in payload.items
+    }
+    if not rows:
+        return {"success": True, "added": []}
+
+    insert = UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if insert is None:
+        result = await db.execute(
+            select(Favorite.movie_slug).where(
+                Favorite.user_id == current_user.id,
+                Favorite.movie_slug.in_(list(rows)),
+            )
+        )
+        for movie_slug in result.scalars():
+            rows.pop(movie_slug)
+        db.add_all(Favorite(**values) for values in rows.values())
+        added = list(rows)
+    else:
+        result = await db.execute(
+            insert(Favorite)
+            .values(list(rows.values()))
+            .on_conflict_do_nothing(
+                index_elements=[Favorite.user_id, Favorite.movie_slug]
+            )
+            .returning(Favorite.movie_slug)
+        )
+        added = list(result.scalars())
+    await db.commit()
+
+    return {"success": True, "added": added}
+
+
+@router.post("/favorites/bulk-delete")
+async def bulk_remove_favorites(
+    payload: FavoriteSlugs,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Remove several movies from favorites"""
+    result = await db.execute(
+        delete(Favorite).where(
+            Favorite.user_id == current_user.id,
+            Favorite.movie_slug.in_(payload.movie_slugs),
+        )
+    )
+    await db.commit()
+
+    return {"success": True, "deleted": result.rowcount}
+
+
 @router.get("/favorites/check/{movie_slug}")
 async def check_favorite(
     movie_slug: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Check if movie is in favorites"""
-    favorite = (
-        db.query(Favorite)
-        .filter(Favorite.user_id == current_user.id, Favorite.movie_slug == movie_slug)
-        .first()
+    result = await db.execute(
+        select(Favorite.id).where(
+            Favorite.user_id == current_user.id, Favorite.movie_slug == movie_slug
+        )
+    )
+
+    return {"is_favorite": result.first() is not None}
+
+
+@router.post("/favorites/check")
+async def check_favorites(
+    payload: FavoriteSlugs,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Check which of the given movies are in favorites"""
+    result = await db.execute(
+        select(Favorite.movie_slug).where(
+            Favorite.user_id == current_user.id,
+            Favorite.movie_slug.in_(payload.movie_slugs),
+        )
     )
+    favorites = set(result.scalars())
 
-    return {"is_favorite": favorite is not None}
+    return {"favorites": {slug: slug in favorites for slug in payload.movie_slugs}}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 import os
 
 
@@ -11,20 +11,109 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    # Defaults to DATABASE_URL with its async driver (aiosqlite / asyncpg)
+    ASYNC_DATABASE_URL: Optional[str] = None
 
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     CACHE_ENABLED: bool = True
     CACHE_TTL: int = 3600
+    CACHE_MAX_STALENESS: int = 3600
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 1024
+    CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_L1_TTL: int = 60
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    # Redis value encoding: "json" (orjson) or "msgpack"; bodies of at least
+    # CACHE_COMPRESS_MIN_SIZE bytes are zstd compressed
+    CACHE_CODEC: str = "json"
+    CACHE_COMPRESS_MIN_SIZE: int = 1024
+    CACHE_ZSTD_LEVEL: int = 3
+
+    # Response compression / encoded catalog bodies
+    GZIP_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 5
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    RESPONSE_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+
+    # Watch progress write-behind buffer
+    PROGRESS_BUFFER_ENABLED: bool = True
+    PROGRESS_FLUSH_INTERVAL: int = 10
+    PROGRESS_FLUSH_BATCH: int = 500
 
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PRINCIPAL_CACHE_TTL: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Password hashing (Argon2); changing costs rehashes users on next login
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
 
     # KKPhim API
     KKPHIM_API_BASE_URL: str = "https://phimapi.com"
     KKPHIM_API_TIMEOUT: int = 30
+    KKPHIM_API_CONNECT_TIMEOUT: float = 5.0
+    KKPHIM_API_READ_TIMEOUT: float = 30.0
+    KKPHIM_API_WRITE_TIMEOUT: float = 10.0
+    KKPHIM_API_POOL_TIMEOUT: float = 5.0
+    KKPHIM_API_MAX_CONNECTIONS: int = 100
+    KKPHIM_API_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    KKPHIM_API_KEEPALIVE_EXPIRY: float = 30.0
+    KKPHIM_API_HTTP2: bool = False
+
+    # Cache warmer: KKPhimService method -> number of pages to keep warm.
+    # Off by default: enable it in one worker (or run it standalone) so N
+    # workers don't each refetch every target. Needs CACHE_ENABLED.
+    CACHE_WARMER_ENABLED: bool = False
+    CACHE_WARMER_INTERVAL: int = 60
+    CACHE_WARMER_CONCURRENCY: int = 4
+    CACHE_WARMER_TARGETS: Dict[str, int] = {
+        "get_new_movies": 3,
+        "get_movies": 2,
+        "get_series": 2,
+        "get_tv_shows": 2,
+        "get_anime": 2,
+        "get_categories": 1,
+        "get_countries": 1,
+    }
+
+    # Local catalog mirror (python -m app.services.catalog_sync)
+    CATALOG_MIRROR_ENABLED: bool = False
+    CATALOG_SYNC_CONCURRENCY: int = 8
+    CATALOG_SYNC_MAX_PAGES: int = 50
+    # Local search index: seconds between checks for newly synced movies
+    SEARCH_INDEX_REFRESH_INTERVAL: int = 60
+    SUGGEST_TOP_K: int = 10
+    # Titles stored per movie by python -m app.services.related_titles
+    RELATED_TOP_K: int = 12
+
+    # Recommendations job (python -m app.services.recommendations)
+    RECOMMENDATIONS_TOP_N: int = 20
+    RECOMMENDATIONS_INTERVAL: int = 300  # Rescore recently active users
+    RECOMMENDATIONS_FULL_INTERVAL: int = 86400  # Recompute item similarity
+    # Activity can commit after newer rows (buffered heartbeats keep their
+    # heartbeat time), so each incremental run also rescans this many
+    # seconds before the last one; never less than PROGRESS_FLUSH_INTERVAL
+    RECOMMENDATIONS_OVERLAP: int = 600
+
+    # Home feed (/api/v1/home)
+    HOME_SECTION_TIMEOUT: float = 2.0
+    HOME_SECTION_SIZE: int = 12
+
+    # Server-side rendering of the browse / movie detail pages
+    SSR_ENABLED: bool = True
+    FRAGMENT_CACHE_MAX_ENTRIES: int = 1024
+    FRAGMENT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # Dev mode: rebuild cached page shells when template files change
+    TEMPLATE_AUTO_RELOAD: bool = False
 
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:8000"]
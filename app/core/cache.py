@@ -1,57 +1,181 @@
-import redis
-import json
-from typing import Optional, Any
+import redis.asyncio as redis
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Optional, Any, Tuple
 from app.config import settings
+from app.core.codec import CacheCodec
+
+
+class LocalCache:
+    """Bounded in-process LRU tier holding already-decoded values.
+
+    Entries are evicted least-recently-used first once either the entry
+    count or the summed payload size (if max_bytes is set) goes over its
+    limit.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: float):
+        self.delete(key)
+        max_bytes = self.max_bytes if self.max_bytes is not None else float("inf")
+        if ttl <= 0 or size > max_bytes:
+            return
+
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+        while len(self._data) > self.max_entries or self.size > max_bytes:
+            _, (_, evicted_size, _) = self._data.popitem(last=False)
+            self.size -= evicted_size
+
+    def delete(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear_pattern(self, pattern: str):
+        for key in [key for key in self._data if fnmatchcase(key, pattern)]:
+            self.delete(key)
 
 
 class CacheManager:
+    """Two-tier cache: optional in-process L1 in front of Redis (L2).
+
+    L1 entries never outlive the Redis TTL and are capped at CACHE_L1_TTL,
+    which also bounds how long another worker's delete can go unseen here.
+    Redis values are binary, encoded by CacheCodec (see app/core/codec.py).
+    """
+
     def __init__(self):
+        self.codec = CacheCodec(
+            settings.CACHE_CODEC,
+            settings.CACHE_COMPRESS_MIN_SIZE,
+            settings.CACHE_ZSTD_LEVEL,
+        )
+        if settings.CACHE_ENABLED and settings.CACHE_L1_ENABLED:
+            self.local = LocalCache(
+                settings.CACHE_L1_MAX_ENTRIES, settings.CACHE_L1_MAX_BYTES
+            )
+        else:
+            self.local = None
+
         if settings.CACHE_ENABLED:
-            self.redis_client = redis.from_url(
-                settings.REDIS_URL, decode_responses=True
+            self.pool = redis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                decode_responses=False,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
             )
+            self.redis_client = redis.Redis(connection_pool=self.pool)
         else:
+            self.pool = None
             self.redis_client = None
 
-    def get(self, key: str) -> Optional[Any]:
+    async def close(self):
+        """Release pooled Redis connections (called from the app lifespan)"""
+        if not self.redis_client:
+            return
+
+        try:
+            await self.redis_client.aclose()
+            await self.pool.disconnect()
+        except Exception as e:
+            print(f"Cache close error: {e}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+
         if not self.redis_client:
             return None
 
         try:
-            data = self.redis_client.get(key)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                data, pttl = await pipe.execute()
             if data:
-                return json.loads(data)
+                value = self.codec.decode(data)
+                if self.local is not None:
+                    # pttl is -1 for keys without expiry
+                    remaining = pttl / 1000 if pttl >= 0 else settings.CACHE_L1_TTL
+                    self.local.set(
+                        key,
+                        value,
+                        self.codec.raw_size(data),
+                        min(settings.CACHE_L1_TTL, remaining),
+                    )
+                return value
         except Exception as e:
             print(f"Cache get error: {e}")
         return None
 
-    def set(self, key: str, value: Any, ttl: int = None):
+    async def set(self, key: str, value: Any, ttl: int = None):
         if not self.redis_client:
             return
 
         try:
             ttl = ttl or settings.CACHE_TTL
-            self.redis_client.setex(key, ttl, json.dumps(value))
+            data = self.codec.encode(value)
+            await self.redis_client.set(key, data, ex=ttl)
+            if self.local is not None:
+                self.local.set(
+                    key,
+                    value,
+                    self.codec.raw_size(data),
+                    min(settings.CACHE_L1_TTL, ttl),
+                )
         except Exception as e:
             print(f"Cache set error: {e}")
 
-    def delete(self, key: str):
+    async def delete(self, key: str):
+        if self.local is not None:
+            self.local.delete(key)
+
         if not self.redis_client:
             return
 
         try:
-            self.redis_client.delete(key)
+            await self.redis_client.delete(key)
         except Exception as e:
             print(f"Cache delete error: {e}")
 
-    def clear_pattern(self, pattern: str):
+    async def clear_pattern(self, pattern: str):
+        if self.local is not None:
+            self.local.clear_pattern(pattern)
+
         if not self.redis_client:
             return
 
         try:
-            keys = self.redis_client.keys(pattern)
+            # SCAN instead of KEYS so large keyspaces don't block Redis
+            keys = [key async for key in self.redis_client.scan_iter(match=pattern)]
             if keys:
-                self.redis_client.delete(*keys)
+                await self.redis_client.delete(*keys)
         except Exception as e:
             print(f"Cache clear pattern error: {e}")
 
@@ -0,0 +1,108 @@
+import json
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; falls back to JSON
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional; values are stored uncompressed
+    zstandard = None
+
+# Encoded values are one header byte followed by the body. The low bits name
+# the format and ZSTD_FLAG marks a zstd-compressed body. Entries written
+# before the header existed are plain JSON text, which can never start with
+# one of these control bytes, so they still decode.
+FORMAT_JSON = 0x01
+FORMAT_MSGPACK = 0x02
+ZSTD_FLAG = 0x80
+FORMATS = {"json": FORMAT_JSON, "msgpack": FORMAT_MSGPACK}
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _json_loads(body: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class CacheCodec:
+    """Versioned binary encoding for Redis cache values.
+
+    `name` picks the format for new writes (msgpack, or json via orjson when
+    installed); bodies of at least `compress_min_size` bytes are zstd
+    compressed. Decoding follows the header byte, so entries written with
+    another format, level or threshold stay readable.
+    """
+
+    def __init__(
+        self,
+        name: str = "json",
+        compress_min_size: Optional[int] = 1024,
+        level: int = 3,
+    ):
+        if name not in FORMATS:
+            raise ValueError(f"Unknown cache codec: {name}")
+        if name == "msgpack" and msgpack is None:
+            name = "json"
+        self.name = name
+        self.format = FORMATS[name]
+
+        if zstandard is None:
+            compress_min_size = None
+        self.compress_min_size = compress_min_size
+        self._compressor = (
+            zstandard.ZstdCompressor(level=level) if zstandard is not None else None
+        )
+        self._decompressor = (
+            zstandard.ZstdDecompressor() if zstandard is not None else None
+        )
+
+    def encode(self, value: Any) -> bytes:
+        if self.format == FORMAT_MSGPACK:
+            body = msgpack.packb(value, use_bin_type=True)
+        else:
+            body = _json_dumps(value)
+
+        header = self.format
+        if self.compress_min_size is not None and len(body) >= self.compress_min_size:
+            body = self._compressor.compress(body)
+            header |= ZSTD_FLAG
+        return bytes((header,)) + body
+
+    def decode(self, data: bytes) -> Any:
+        header = data[0]
+        if header & ~ZSTD_FLAG not in (FORMAT_JSON, FORMAT_MSGPACK):
+            return _json_loads(data)
+
+        body = data[1:]
+        if header & ZSTD_FLAG:
+            if self._decompressor is None:
+                raise ValueError("zstd-compressed cache value but zstandard is missing")
+            body = self._decompressor.decompress(body)
+
+        if header & ~ZSTD_FLAG == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise ValueError("msgpack cache value but msgpack is missing")
+            return msgpack.unpackb(body, raw=False)
+        return _json_loads(body)
+
+    def raw_size(self, data: bytes) -> int:
+        """Uncompressed body size, for memory accounting of the decoded value"""
+        if data[0] & ZSTD_FLAG and zstandard is not None:
+            size = zstandard.frame_content_size(data[1:])
+            if size >= 0:
+                return size
+        return len(data)
@@ -0,0 +1,152 @@
+import gzip
+import json
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.core.cache import LocalCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Serialized (and compressed) catalog bodies keyed by URL + upstream ETag, so
+# a hit is served without re-encoding JSON or recompressing.
+response_cache = LocalCache(
+    settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES
+)
+
+
+def cache_headers(result, private: bool = False) -> Dict[str, str]:
+    """ETag and Cache-Control for a cached KKPhim result (see CachedData)"""
+    headers = {}
+    etag = getattr(result, "etag", None)
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+    if private:
+        # Per-user payload: the browser may keep it but must revalidate
+        headers["Cache-Control"] = "private, no-cache"
+        return headers
+
+    # Fresh for whatever is left of the service-side soft TTL, then stale but
+    # usable for as long as the service itself would keep serving it.
+    max_age = max(int(getattr(result, "fresh_until", 0) - time.time()), 0)
+    stale = settings.CACHE_MAX_STALENESS
+    headers["Cache-Control"] = (
+        f"public, max-age={max_age}, "
+        f"stale-while-revalidate={stale}, stale-if-error={stale}"
+    )
+    return headers
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _qualities(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Coding -> q-value from an Accept-Encoding header (q defaults to 1)"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """
+    Pick br, gzip or identity from an Accept-Encoding header: the highest
+    q-value among the codings we can produce (br on a tie), with `*`
+    standing in for codings not listed. identity wins only when listed with
+    a higher q than both, or when neither compressed coding is acceptable.
+    """
+    accepted = _qualities(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = "identity", 0.0
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    if accepted.get("identity", 0.0) > best_quality:
+        return "identity"
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL)
+
+
+def cached_response(
+    request: Request, result, payload: Any, private: bool = False
+) -> Response:
+    """
+    JSON response for a cached KKPhim result with HTTP caching applied.
+
+    Returns a bare 304 when If-None-Match matches. Otherwise the encoded body
+    for this URL and upstream ETag is served from response_cache, encoding
+    and compressing `payload` only the first time each variant is needed.
+    `private` responses are marked as such and never stored.
+    """
+    headers = cache_headers(result, private)
+    # On the 304 too, so revalidated entries keep the same Vary
+    headers["Vary"] = "Accept-Encoding"
+    etag = headers.get("ETag")
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    shared = etag is not None and not private
+    key = f"{request.url.path}?{request.url.query}:{etag}"
+    variants = response_cache.get(key) if shared else None
+    changed = variants is None
+    if variants is None:
+        variants = {
+            "identity": json.dumps(
+                payload, ensure_ascii=False, separators=(",", ":")
+            ).encode()
+        }
+
+    encoding = "identity"
+    if len(variants["identity"]) >= settings.GZIP_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding not in variants:
+        variants[encoding] = compress(variants["identity"], encoding)
+        changed = True
+
+    if shared and changed:
+        # Keyed by ETag, so the bodies are valid for as long as the entry is
+        remaining = max(result.fresh_until - time.time(), 0)
+        response_cache.set(
+            key,
+            variants,
+            sum(len(body) for body in variants.values()),
+            remaining + settings.CACHE_MAX_STALENESS,
+        )
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=variants[encoding], media_type="application/json", headers=headers
+    )
@@ -0,0 +1,21 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(sort_value: Optional[datetime], row_id: int) -> str:
+    """Opaque keyset cursor for the (timestamp, id) position of the last row"""
+    payload = json.dumps([sort_value.isoformat() if sort_value else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,4 @@
+from fastapi.templating import Jinja2Templates
+
+# Shared by the page routes and the server-side fragment renderer
+templates = Jinja2Templates(directory="app/templates")
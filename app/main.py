@@ -1,24 +1,68 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
 import logging
 
 from app.config import settings
 from app.api.v1.api import api_router
-from app.database import engine, Base
+from app.database import async_engine, Base
+from app.core.cache import cache
+from app.core.security import hashing_pool
+from app.core.templates import templates
+from app.services.kkphim_service import kkphim_service
+from app.services.cache_warmer import cache_warmer
+from app.services.page_service import (
+    browse_context,
+    movie_detail_context,
+    page_shells,
+)
+from app.services.search_index import search_index
+from app.services.watch_service import progress_buffer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables on startup
+    logger.info("Creating database tables...")
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    logger.info("Database tables created successfully!")
+
+    # Open the pooled upstream client once per worker
+    await kkphim_service.startup()
+    page_shells.warm()
+    if settings.CATALOG_MIRROR_ENABLED:
+        await search_index.refresh(force=True)
+        await search_index.wait_for_derived()
+    if settings.CACHE_WARMER_ENABLED and settings.CACHE_ENABLED:
+        cache_warmer.start()
+    if settings.PROGRESS_BUFFER_ENABLED:
+        progress_buffer.start()
+    try:
+        yield
+    finally:
+        await progress_buffer.stop()
+        await cache_warmer.stop()
+        await kkphim_service.shutdown()
+        await cache.close()
+        await async_engine.dispose()
+        hashing_pool.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     debug=settings.DEBUG,
     version="1.0.0",
     description="Movie Streaming Website API",
+    lifespan=lifespan,
 )
 
 # CORS Middleware
@@ -30,43 +74,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress everything else above the size threshold; catalog routes send
+# precompressed bodies (Content-Encoding set) which this middleware skips.
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Templates
-templates = Jinja2Templates(directory="app/templates")
-
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
 
-# Create database tables on startup
-@app.on_event("startup")
-async def startup_event():
-    logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully!")
-
-
 # Root endpoint
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Homepage"""
-    return templates.TemplateResponse("home.html", {"request": request})
+    return page_shells.response(request, "home.html")
 
 
 # Health check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "app": settings.APP_NAME}
+    return {
+        "status": "healthy",
+        "app": settings.APP_NAME,
+        "kkphim_singleflight": kkphim_service.flights.stats(),
+        "password_hashing": hashing_pool.stats(),
+    }
 
 
 # Movie detail page
 @app.get("/movie/{slug}", response_class=HTMLResponse)
 async def movie_page(request: Request, slug: str):
-    """Movie detail page"""
+    """Movie detail page (server-rendered when SSR_ENABLED)"""
     return templates.TemplateResponse(
-        "movie_detail.html", {"request": request, "slug": slug}
+        request, "movie_detail.html", await movie_detail_context(slug)
     )
 
 
@@ -74,64 +116,72 @@ async def movie_page(request: Request, slug: str):
 @app.get("/watch/{slug}", response_class=HTMLResponse)
 async def watch_page(request: Request, slug: str):
     """Watch/player page"""
-    return templates.TemplateResponse("player.html", {"request": request, "slug": slug})
+    return templates.TemplateResponse(request, "player.html", {"slug": slug})
 
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return page_shells.response(request, "login.html")
 
 
 @app.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request})
+    return page_shells.response(request, "register.html")
 
 
 @app.get("/search", response_class=HTMLResponse)
 async def search_page(request: Request):
-    return templates.TemplateResponse("search.html", {"request": request})
+    return page_shells.response(request, "search.html")
 
 
 @app.get("/profile", response_class=HTMLResponse)
 async def profile_page(request: Request):
-    return templates.TemplateResponse("profile.html", {"request": request})
+    return page_shells.response(request, "profile.html")
 
 
 @app.get("/watch-history", response_class=HTMLResponse)
 async def watch_history_page(request: Request):
-    return templates.TemplateResponse("watch_history.html", {"request": request})
+    return page_shells.response(request, "watch_history.html")
 
 
 @app.get("/favorites", response_class=HTMLResponse)
 async def favorites_page(request: Request):
-    return templates.TemplateResponse("favorites.html", {"request": request})
+    return page_shells.response(request, "favorites.html")
 
 
 @app.get("/my-list", response_class=HTMLResponse)
 async def my_list_page(request: Request):
-    return templates.TemplateResponse("favorites.html", {"request": request})
+    return page_shells.response(request, "favorites.html")
 
 
 @app.get("/browse/movies", response_class=HTMLResponse)
-async def browse_movies_page(request: Request):
-    return templates.TemplateResponse("browse_movies.html", {"request": request})
+async def browse_movies_page(request: Request, page: int = Query(1, ge=1)):
+    return templates.TemplateResponse(
+        request, "browse_movies.html", await browse_context("movies", page)
+    )
 
 
 @app.get("/browse/series", response_class=HTMLResponse)
-async def browse_series_page(request: Request):
-    return templates.TemplateResponse("browse_series.html", {"request": request})
+async def browse_series_page(request: Request, page: int = Query(1, ge=1)):
+    return templates.TemplateResponse(
+        request, "browse_series.html", await browse_context("series", page)
+    )
 
 @app.get("/browse/tv-shows", response_class=HTMLResponse)
-async def browse_tv_shows_page(request: Request):
-    return templates.TemplateResponse("browse_tv-shows.html", {"request": request})
+async def browse_tv_shows_page(request: Request, page: int = Query(1, ge=1)):
+    return templates.TemplateResponse(
+        request, "browse_tv-shows.html", await browse_context("tv-shows", page)
+    )
 
 @app.get("/browse/anime", response_class=HTMLResponse)
-async def browse_anime_page(request: Request):
-    return templates.TemplateResponse("browse_anime.html", {"request": request})
+async def browse_anime_page(request: Request, page: int = Query(1, ge=1)):
+    return templates.TemplateResponse(
+        request, "browse_anime.html", await browse_context("anime", page)
+    )
 
 @app.get("/browse/countries/{slug}", response_class=HTMLResponse)
 async def browse_countries_page(request: Request, slug: str):
-    return templates.TemplateResponse("browse_countries.html", {"request": request, "slug": slug})
+    return templates.TemplateResponse(request, "browse_countries.html", {"slug": slug})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,150 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    JSON,
+    Table,
+)
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+# Local mirror of the KKPhim catalog, filled by app/services/catalog_sync.py
+
+movie_categories = Table(
+    "movie_categories",
+    Base.metadata,
+    Column(
+        "movie_id",
+        Integer,
+        ForeignKey("movies.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "category_id",
+        Integer,
+        ForeignKey("categories.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+)
+
+movie_countries = Table(
+    "movie_countries",
+    Base.metadata,
+    Column(
+        "movie_id",
+        Integer,
+        ForeignKey("movies.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "country_id",
+        Integer,
+        ForeignKey("countries.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+)
+
+
+class Category(Base):
+    __tablename__ = "categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    external_id = Column(String, nullable=True)  # Upstream _id
+
+
+class Country(Base):
+    __tablename__ = "countries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, nullable=False)
+    name = Column(String, nullable=False)
+    external_id = Column(String, nullable=True)  # Upstream _id
+
+
+class Movie(Base):
+    __tablename__ = "movies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String, unique=True, nullable=False)
+    external_id = Column(String, nullable=True)  # Upstream _id
+    name = Column(String, nullable=False)
+    origin_name = Column(String, nullable=True)
+    type = Column(String, index=True, nullable=True)  # single/series/tvshows/hoathinh
+    quality = Column(String, nullable=True)
+    lang = Column(String, nullable=True)
+    year = Column(Integer, index=True, nullable=True)
+    time = Column(String, nullable=True)
+    episode_current = Column(String, nullable=True)
+    episode_total = Column(String, nullable=True)
+    poster_url = Column(String, nullable=True)
+    thumb_url = Column(String, nullable=True)
+    view = Column(Integer, default=0)
+    actor = Column(JSON, nullable=True)
+    director = Column(JSON, nullable=True)
+    modified = Column(DateTime, index=True, nullable=True)  # Upstream modified.time
+    synced_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Upstream `movie` object (trimmed), served as-is for detail requests
+    data = Column(JSON, nullable=False)
+
+    # Relationships
+    categories = relationship("Category", secondary=movie_categories)
+    countries = relationship("Country", secondary=movie_countries)
+    episodes = relationship(
+        "Episode",
+        back_populates="movie",
+        order_by="Episode.position",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class Episode(Base):
+    __tablename__ = "episodes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    movie_id = Column(
+        Integer, ForeignKey("movies.id", ondelete="CASCADE"), nullable=False
+    )
+    server_name = Column(String, nullable=False)
+    position = Column(Integer, nullable=False)  # Upstream order across servers
+    name = Column(String, nullable=False)
+    slug = Column(String, nullable=False)
+    filename = Column(String, nullable=True)
+    link_embed = Column(String, nullable=True)
+    link_m3u8 = Column(String, nullable=True)
+
+    # Relationships
+    movie = relationship("Movie", back_populates="episodes")
+
+
+Index("ix_episodes_movie_position", Episode.movie_id, Episode.position)
+
+
+class MovieRelated(Base):
+    __tablename__ = "movie_related"
+
+    # Precomputed by app/services/related_titles.py; one row per movie
+    movie_id = Column(
+        Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True
+    )
+    items = Column(JSON, nullable=False)  # Listing items, most similar first
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CatalogSyncState(Base):
+    __tablename__ = "catalog_sync_state"
+
+    # Written by app/services/catalog_sync.py; one row per walked listing
+    list_slug = Column(String, primary_key=True)
+    # Last run that walked every page without failures; None while the
+    # mirror may be missing titles (never fully synced, or a backlog that
+    # outgrew --max-pages)
+    full_synced_at = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -16,3 +16,10 @@ class Favorite(Base):
 
     # Relationships
     user = relationship("User", back_populates="favorites")
+
+
+# One favorite per (user, movie); also the ON CONFLICT target for bulk adds
+Index("ux_favorites_user_movie", Favorite.user_id, Favorite.movie_slug, unique=True)
+
+# Keyset pagination of a user's favorites by (added_at, id)
+Index("ix_favorites_user_added_at", Favorite.user_id, Favorite.added_at)
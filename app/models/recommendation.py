@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, JSON
+from datetime import datetime
+from app.database import Base
+
+
+class UserRecommendation(Base):
+    __tablename__ = "user_recommendations"
+
+    # Precomputed by app/services/recommendations.py; one row per user
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    items = Column(JSON, nullable=False)  # Best first, each with a "because" slug
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Float,
+    DateTime,
+    ForeignKey,
+    Index,
+    func,
+    literal_column,
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -18,3 +28,26 @@ class WatchHistory(Base):
 
     # Relationships
     user = relationship("User", back_populates="watch_history")
+
+
+# One row per (user, movie, episode); NULL episodes (single movies) are folded
+# to '' so they collide too. Used as the ON CONFLICT target for upserts, so the
+# '' is a literal rather than a bound parameter.
+WATCH_HISTORY_CONFLICT_TARGET = (
+    WatchHistory.user_id,
+    WatchHistory.movie_slug,
+    func.coalesce(WatchHistory.episode_slug, literal_column("''")),
+)
+
+Index(
+    "ux_watch_history_user_movie_episode",
+    *WATCH_HISTORY_CONFLICT_TARGET,
+    unique=True,
+)
+
+# Keyset pagination of a user's history by (last_watched, id)
+Index(
+    "ix_watch_history_user_last_watched",
+    WatchHistory.user_id,
+    WatchHistory.last_watched,
+)
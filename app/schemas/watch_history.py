@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 
 class WatchHistoryBase(BaseModel):
@@ -28,6 +28,10 @@ class WatchHistoryResponse(WatchHistoryBase):
         from_attributes = True
 
 
+class WatchHistoryBulkDelete(BaseModel):
+    ids: List[int]
+
+
 class FavoriteCreate(BaseModel):
     movie_slug: str
     movie_name: str
@@ -41,3 +45,11 @@ class FavoriteResponse(FavoriteCreate):
 
     class Config:
         from_attributes = True
+
+
+class FavoriteBulkCreate(BaseModel):
+    items: List[FavoriteCreate]
+
+
+class FavoriteSlugs(BaseModel):
+    movie_slugs: List[str]
@@ -0,0 +1,112 @@
+"""
+Background cache warmer for the landing/browse pages
+File: app/services/cache_warmer.py
+
+Run inside the app lifespan (CACHE_WARMER_ENABLED) or standalone:
+    python -m app.services.cache_warmer [--once]
+"""
+
+import argparse
+import asyncio
+import inspect
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.core.cache import cache
+from app.services.kkphim_service import kkphim_service, refresh_ahead, KKPhimService
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    def __init__(
+        self,
+        service: KKPhimService = kkphim_service,
+        targets: Optional[Dict[str, int]] = None,
+        interval: int = settings.CACHE_WARMER_INTERVAL,
+        concurrency: int = settings.CACHE_WARMER_CONCURRENCY,
+    ):
+        self.service = service
+        self.targets = settings.CACHE_WARMER_TARGETS if targets is None else targets
+        self.interval = interval
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+
+    def _calls(self) -> List[Tuple[str, dict]]:
+        """Expand {method: pages} into individual service calls"""
+        calls = []
+        for name, pages in self.targets.items():
+            method = getattr(self.service, name, None)
+            if method is None or not name.startswith("get_"):
+                logger.warning("Cache warmer: unknown target %s", name)
+                continue
+            if "page" in inspect.signature(method).parameters:
+                calls.extend((name, {"page": page}) for page in range(1, pages + 1))
+            else:
+                calls.append((name, {}))
+        return calls
+
+    async def run_once(self) -> Dict[str, int]:
+        """Refresh every target that is missing or goes stale before the next run"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failed = 0
+
+        async def warm(name: str, kwargs: dict):
+            nonlocal failed
+            async with semaphore:
+                refresh_ahead.set(self.interval)
+                try:
+                    if not await getattr(self.service, name)(**kwargs):
+                        failed += 1
+                except Exception as e:
+                    failed += 1
+                    logger.warning("Cache warmer: %s%s failed: %s", name, kwargs, e)
+
+        calls = self._calls()
+        await asyncio.gather(*(warm(name, kwargs) for name, kwargs in calls))
+        return {"targets": len(calls), "failed": failed}
+
+    async def run_forever(self):
+        while True:
+            result = await self.run_once()
+            logger.info("Cache warmer: %s", result)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+cache_warmer = CacheWarmer()
+
+
+async def _main(once: bool):
+    if not settings.CACHE_ENABLED:
+        logger.warning("Cache warmer: CACHE_ENABLED is off, nothing to warm")
+        return
+    try:
+        if once:
+            logger.info("Cache warmer: %s", await cache_warmer.run_once())
+        else:
+            await cache_warmer.run_forever()
+    finally:
+        await kkphim_service.shutdown()
+        await cache.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Keep hot KKPhim cache keys warm")
+    parser.add_argument("--once", action="store_true", help="run a single pass")
+    args = parser.parse_args()
+    asyncio.run(_main(args.once))
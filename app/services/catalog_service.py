@@ -0,0 +1,358 @@
+"""
+Reads and writes for the local catalog mirror
+File: app/services/catalog_service.py
+"""
+
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.database import UPSERT_DIALECTS
+from app.models.catalog import (
+    CatalogSyncState,
+    Category,
+    Country,
+    Episode,
+    Movie,
+    MovieRelated,
+    movie_categories,
+    movie_countries,
+)
+
+# Detail responses carry absolute image URLs; the v1 listings carry them
+# relative to this CDN (the templates prepend it).
+IMAGE_CDN = "https://phimimg.com/"
+
+# Upstream list slug -> Movie.type
+LIST_TYPES = {
+    "phim-le": "single",
+    "phim-bo": "series",
+    "tv-shows": "tvshows",
+    "hoat-hinh": "hoathinh",
+}
+
+# The listing catalog_sync walks; every title appears in it, so a complete
+# walk covers the filtered lists too
+SYNC_LIST = "phim-moi-cap-nhat"
+
+
+def parse_modified(value) -> Optional[datetime]:
+    """Upstream {"time": "...Z"} (or a bare string) as naive UTC"""
+    if isinstance(value, dict):
+        value = value.get("time")
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _as_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _upsert_by_slug(db: AsyncSession, model, rows: List[dict]) -> Dict[str, int]:
+    """Insert or update rows keyed by slug; returns {slug: id}"""
+    if not rows:
+        return {}
+
+    insert_ = UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if insert_ is None:
+        for values in rows:
+            result = await db.execute(select(model).where(model.slug == values["slug"]))
+            existing = result.scalars().first()
+            if existing is None:
+                db.add(model(**values))
+            else:
+                for field, value in values.items():
+                    setattr(existing, field, value)
+        await db.flush()
+    else:
+        stmt = insert_(model).values(rows)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[model.slug],
+                set_={key: stmt.excluded[key] for key in rows[0] if key != "slug"},
+            )
+        )
+
+    result = await db.execute(
+        select(model.slug, model.id).where(
+            model.slug.in_([row["slug"] for row in rows])
+        )
+    )
+    return dict(result.all())
+
+
+def _term_rows(terms: Iterable[dict]) -> List[dict]:
+    # Sorted so concurrent syncs lock shared term rows in the same order
+    rows = {}
+    for term in terms or []:
+        if term.get("slug"):
+            rows[term["slug"]] = {
+                "slug": term["slug"],
+                "name": term.get("name") or term["slug"],
+                "external_id": term.get("_id") or term.get("id"),
+            }
+    return [rows[slug] for slug in sorted(rows)]
+
+
+async def upsert_terms(
+    db: AsyncSession, model, terms: Iterable[dict]
+) -> Dict[str, int]:
+    """Store upstream categories / countries; returns {slug: id}"""
+    return await _upsert_by_slug(db, model, _term_rows(terms))
+
+
+async def upsert_movie(db: AsyncSession, detail: Dict) -> int:
+    """
+    Write one upstream /phim/{slug} response: the movie row, its category
+    and country links, and its episodes (replaced wholesale).
+    """
+    movie = detail["movie"]
+    category_ids = await upsert_terms(db, Category, movie.get("category"))
+    country_ids = await upsert_terms(db, Country, movie.get("country"))
+
+    row = {
+        "slug": movie["slug"],
+        "external_id": movie.get("_id"),
+        "name": movie.get("name") or movie["slug"],
+        "origin_name": movie.get("origin_name"),
+        "type": movie.get("type"),
+        "quality": movie.get("quality"),
+        "lang": movie.get("lang"),
+        "year": _as_int(movie.get("year")),
+        "time": movie.get("time"),
+        "episode_current": movie.get("episode_current"),
+        "episode_total": movie.get("episode_total"),
+        "poster_url": movie.get("poster_url"),
+        "thumb_url": movie.get("thumb_url"),
+        "view": _as_int(movie.get("view")) or 0,
+        "actor": movie.get("actor") or [],
+        "director": movie.get("director") or [],
+        "modified": parse_modified(movie.get("modified")),
+        "synced_at": datetime.utcnow(),
+        "data": movie,
+    }
+    movie_id = (await _upsert_by_slug(db, Movie, [row]))[movie["slug"]]
+
+    for table, column, ids in (
+        (movie_categories, "category_id", category_ids),
+        (movie_countries, "country_id", country_ids),
+    ):
+        await db.execute(delete(table).where(table.c.movie_id == movie_id))
+        if ids:
+            await db.execute(
+                insert(table),
+                [{"movie_id": movie_id, column: term_id} for term_id in ids.values()],
+            )
+
+    await db.execute(delete(Episode).where(Episode.movie_id == movie_id))
+    episodes = [
+        {
+            "movie_id": movie_id,
+            "server_name": server.get("server_name") or "",
+            "position": position,
+            "name": episode.get("name") or episode.get("slug") or "",
+            "slug": episode.get("slug") or "",
+            "filename": episode.get("filename"),
+            "link_embed": episode.get("link_embed"),
+            "link_m3u8": episode.get("link_m3u8"),
+        }
+        for position, (server, episode) in enumerate(
+            (server, episode)
+            for server in detail.get("episodes") or []
+            for episode in server.get("server_data") or []
+        )
+    ]
+    if episodes:
+        await db.execute(insert(Episode), episodes)
+    return movie_id
+
+
+async def modified_times(
+    db: AsyncSession, slugs: List[str]
+) -> Dict[str, Optional[datetime]]:
+    """Mirrored `modified` timestamps for the given slugs (missing = not mirrored)"""
+    if not slugs:
+        return {}
+    result = await db.execute(
+        select(Movie.slug, Movie.modified).where(Movie.slug.in_(slugs))
+    )
+    return dict(result.all())
+
+
+async def get_movie_detail(db: AsyncSession, slug: str) -> Optional[Dict]:
+    """Mirrored movie in the upstream /phim/{slug} shape"""
+    result = await db.execute(
+        select(Movie).where(Movie.slug == slug).options(selectinload(Movie.episodes))
+    )
+    movie = result.scalars().first()
+    if movie is None:
+        return None
+
+    servers: Dict[str, List[dict]] = {}
+    for episode in movie.episodes:
+        servers.setdefault(episode.server_name, []).append(
+            {
+                "name": episode.name,
+                "slug": episode.slug,
+                "filename": episode.filename,
+                "link_embed": episode.link_embed,
+                "link_m3u8": episode.link_m3u8,
+            }
+        )
+    return {
+        "status": True,
+        "msg": "",
+        "movie": movie.data,
+        "episodes": [
+            {"server_name": name, "server_data": data} for name, data in servers.items()
+        ],
+    }
+
+
+def _term(term) -> dict:
+    return {"id": term.external_id, "name": term.name, "slug": term.slug}
+
+
+def _relative(url: Optional[str]) -> Optional[str]:
+    if url and url.startswith(IMAGE_CDN):
+        return url[len(IMAGE_CDN) :]
+    return url
+
+
+def list_item(movie: Movie, relative_images: bool = True) -> dict:
+    """Listing item in the upstream shape (v1 lists use relative image paths)"""
+    image = _relative if relative_images else (lambda url: url)
+    return {
+        "_id": movie.external_id,
+        "name": movie.name,
+        "slug": movie.slug,
+        "origin_name": movie.origin_name,
+        "type": movie.type,
+        "poster_url": image(movie.poster_url),
+        "thumb_url": image(movie.thumb_url),
+        "time": movie.time,
+        "episode_current": movie.episode_current,
+        "episode_total": movie.episode_total,
+        "quality": movie.quality,
+        "lang": movie.lang,
+        "year": movie.year,
+        "modified": (
+            {"time": movie.modified.isoformat() + "Z"} if movie.modified else None
+        ),
+        "category": [_term(category) for category in movie.categories],
+        "country": [_term(country) for country in movie.countries],
+    }
+
+
+async def full_synced_at(db: AsyncSession) -> Optional[datetime]:
+    """When the mirror last held the whole catalog (None if it may not)"""
+    state = await db.get(CatalogSyncState, SYNC_LIST)
+    return state.full_synced_at if state else None
+
+
+async def set_full_synced_at(db: AsyncSession, synced_at: Optional[datetime]):
+    await db.merge(CatalogSyncState(list_slug=SYNC_LIST, full_synced_at=synced_at))
+
+
+async def list_movies(
+    db: AsyncSession,
+    page: int = 1,
+    limit: int = 20,
+    type: Optional[str] = None,
+    category: Optional[str] = None,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    v1: bool = True,
+) -> Optional[Dict]:
+    """
+    Newest-modified-first listing from the mirror in the upstream shape:
+    {"status", "data": {"items", "params": {"pagination"}}} for the v1 lists,
+    {"status", "items", "pagination"} for /danh-sach/phim-moi-cap-nhat.
+    None when the mirror can't answer (no complete sync yet, nothing
+    matches, or the page is past the last match), so callers fall back to
+    upstream.
+    """
+    if await full_synced_at(db) is None:
+        return None
+
+    query = select(Movie)
+    if type:
+        query = query.where(Movie.type == type)
+    if year:
+        query = query.where(Movie.year == year)
+    if category:
+        query = query.where(
+            Movie.id.in_(
+                select(movie_categories.c.movie_id)
+                .join(Category, Category.id == movie_categories.c.category_id)
+                .where(Category.slug == category)
+            )
+        )
+    if country:
+        query = query.where(
+            Movie.id.in_(
+                select(movie_countries.c.movie_id)
+                .join(Country, Country.id == movie_countries.c.country_id)
+                .where(Country.slug == country)
+            )
+        )
+
+    total = (
+        await db.execute(select(func.count()).select_from(query.subquery()))
+    ).scalar_one()
+    if (page - 1) * limit >= total:
+        return None
+
+    result = await db.execute(
+        query.options(selectinload(Movie.categories), selectinload(Movie.countries))
+        .order_by(Movie.modified.desc(), Movie.id.desc())
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+    items = [list_item(movie, relative_images=v1) for movie in result.scalars().all()]
+    pagination = {
+        "totalItems": total,
+        "totalItemsPerPage": limit,
+        "currentPage": page,
+        "totalPages": math.ceil(total / limit),
+    }
+    if not v1:
+        return {"status": True, "items": items, "pagination": pagination}
+    return {
+        "status": True,
+        "data": {"items": items, "params": {"pagination": pagination}},
+    }
+
+
+async def list_terms(db: AsyncSession, model) -> Optional[List[dict]]:
+    """Mirrored categories / countries in the upstream /the-loai shape"""
+    result = await db.execute(select(model).order_by(model.name))
+    terms = [
+        {"_id": term.external_id, "name": term.name, "slug": term.slug}
+        for term in result.scalars().all()
+    ]
+    return terms or None
+
+
+async def get_related(db: AsyncSession, slug: str) -> Optional[List[dict]]:
+    """Precomputed related titles (see related_titles.py); None if not built"""
+    result = await db.execute(
+        select(MovieRelated.items)
+        .join(Movie, Movie.id == MovieRelated.movie_id)
+        .where(Movie.slug == slug)
+    )
+    return result.scalars().first()
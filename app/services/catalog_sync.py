@@ -0,0 +1,161 @@
+"""
+Incremental sync of the KKPhim catalog into the local mirror
+File: app/services/catalog_sync.py
+
+Walks /danh-sach/phim-moi-cap-nhat (newest modification first) and re-fetches
+only the titles whose `modified` time differs from the mirrored one. Run from
+cron or by hand:
+    python -m app.services.catalog_sync [--full] [--max-pages N]
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.core.cache import cache
+from app.database import AsyncSessionLocal, async_engine
+from app.models.catalog import Category, Country
+from app.services import catalog_service
+from app.services.kkphim_service import kkphim_service, KKPhimService
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSync:
+    def __init__(
+        self,
+        service: KKPhimService = kkphim_service,
+        concurrency: int = settings.CATALOG_SYNC_CONCURRENCY,
+        max_pages: int = settings.CATALOG_SYNC_MAX_PAGES,
+    ):
+        self.service = service
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+
+    async def sync_terms(self) -> int:
+        """Mirror the full category and country lists"""
+        synced = 0
+        async with AsyncSessionLocal() as db:
+            for model, endpoint in ((Category, "/the-loai"), (Country, "/quoc-gia")):
+                terms = await self.service.fetch_live(endpoint)
+                if isinstance(terms, list):
+                    ids = await catalog_service.upsert_terms(db, model, terms)
+                    synced += len(ids)
+            await db.commit()
+        return synced
+
+    async def _changed(self, items: List[dict]) -> List[str]:
+        """Slugs on a listing page that are missing from or older in the mirror"""
+        slugs = [item["slug"] for item in items if item.get("slug")]
+        async with AsyncSessionLocal() as db:
+            known = await catalog_service.modified_times(db, slugs)
+        return [
+            item["slug"]
+            for item in items
+            if item.get("slug")
+            and (
+                item["slug"] not in known
+                or catalog_service.parse_modified(item.get("modified"))
+                != known[item["slug"]]
+            )
+        ]
+
+    async def sync_movie(self, slug: str) -> bool:
+        """Fetch one title and replace its mirrored row, links and episodes"""
+        detail = await self.service.fetch_live(f"/phim/{slug}")
+        if not detail or not detail.get("movie"):
+            return False
+
+        async with AsyncSessionLocal() as db:
+            await catalog_service.upsert_movie(db, detail)
+            await db.commit()
+        # Next detail request is answered from the fresh mirror row
+        await cache.delete(f"movie_detail:{slug}")
+        return True
+
+    async def _set_full_synced_at(self, synced_at: Optional[datetime]):
+        async with AsyncSessionLocal() as db:
+            await catalog_service.set_full_synced_at(db, synced_at)
+            await db.commit()
+
+    async def run(
+        self, full: bool = False, max_pages: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Sync listing pages until one has no changes (or every page with
+        `full`), bounded by `max_pages` (default CATALOG_SYNC_MAX_PAGES, none
+        for a full sync) and the upstream page count. A full sync that
+        reaches the last page without failures marks the mirror complete; a
+        run cut short by `max_pages` marks it incomplete again.
+        """
+        if max_pages is None and not full:
+            max_pages = self.max_pages
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stats = {"pages": 0, "changed": 0, "synced": 0, "failed": 0}
+        stats["terms"] = await self.sync_terms()
+
+        async def sync(slug: str):
+            async with semaphore:
+                try:
+                    ok = await self.sync_movie(slug)
+                except Exception as e:
+                    ok = False
+                    logger.warning("Catalog sync: %s failed: %s", slug, e)
+                stats["synced" if ok else "failed"] += 1
+
+        reached_end = False
+        page = 1
+        while max_pages is None or page <= max_pages:
+            listing = await self.service.fetch_live(
+                f"/danh-sach/{catalog_service.SYNC_LIST}", {"page": page}
+            )
+            items = (listing or {}).get("items") or []
+            if not items:
+                reached_end = listing is not None
+                break
+            stats["pages"] += 1
+
+            changed = await self._changed(items)
+            stats["changed"] += len(changed)
+            await asyncio.gather(*(sync(slug) for slug in changed))
+            if not changed and not full:
+                break
+
+            total_pages = (listing.get("pagination") or {}).get("totalPages")
+            if total_pages and page >= total_pages:
+                reached_end = True
+                break
+            page += 1
+        else:
+            # Stopped with changes still coming: older titles may be missing
+            await self._set_full_synced_at(None)
+
+        if full and reached_end and not stats["failed"]:
+            await self._set_full_synced_at(datetime.utcnow())
+        return stats
+
+
+catalog_sync = CatalogSync()
+
+
+async def _main(full: bool, max_pages: Optional[int]):
+    try:
+        logger.info("Catalog sync: %s", await catalog_sync.run(full, max_pages))
+    finally:
+        await kkphim_service.shutdown()
+        await cache.close()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Mirror the KKPhim catalog locally")
+    parser.add_argument(
+        "--full", action="store_true", help="walk every page, not just new changes"
+    )
+    parser.add_argument("--max-pages", type=int, help="stop after this many pages")
+    args = parser.parse_args()
+    asyncio.run(_main(args.full, args.max_pages))
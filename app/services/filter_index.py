@@ -0,0 +1,147 @@
+"""
+Bitmap index for combined catalog filters and facet counts
+File: app/services/filter_index.py
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+# Facets with discrete values; year is also a facet but filtered by range
+FACETS = ("category", "country", "type", "quality")
+
+# Bytes per word when skipping earlier pages by popcount
+WORD_BYTES = 8
+
+
+def _bitmap(positions: List[int], size: int) -> int:
+    """Python int with the given bit positions set"""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _values(item: dict, facet: str) -> List[str]:
+    if facet in ("category", "country"):
+        return [term["slug"] for term in item.get(facet) or [] if term.get("slug")]
+    value = item.get(facet)
+    return [value] if value else []
+
+
+class FilterIndex:
+    """
+    One bitmap (a Python int) per facet value over the mirrored titles.
+
+    Bit positions follow the newest-modified-first listing order, so a
+    filter is a few ANDs/ORs and a page is read straight off the low bits.
+    Values within a facet are ORed and facets are ANDed; each facet's counts
+    apply every filter except its own, so the counts show what selecting
+    another value of that facet would return.
+    """
+
+    def __init__(self):
+        self._items: List[dict] = []
+        self._all = 0
+        self._bitmaps: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self._years: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def build(self, items: Iterable[dict]):
+        """(Re)build from listing items (catalog_service.list_item shape)"""
+        ordered = sorted(
+            items,
+            key=lambda item: (item.get("modified") or {}).get("time") or "",
+            reverse=True,
+        )
+        positions = {facet: defaultdict(list) for facet in FACETS}
+        years = defaultdict(list)
+        for position, item in enumerate(ordered):
+            for facet in FACETS:
+                for value in _values(item, facet):
+                    positions[facet][value].append(position)
+            if isinstance(item.get("year"), int):
+                years[item["year"]].append(position)
+
+        size = len(ordered)
+        self._items = ordered
+        self._all = (1 << size) - 1
+        self._bitmaps = {
+            facet: {
+                value: _bitmap(bits, size) for value, bits in positions[facet].items()
+            }
+            for facet in FACETS
+        }
+        self._years = {year: _bitmap(bits, size) for year, bits in years.items()}
+
+    def _year_mask(self, year_from: Optional[int], year_to: Optional[int]) -> int:
+        mask = 0
+        for year, bitmap in self._years.items():
+            if (year_from is None or year >= year_from) and (
+                year_to is None or year <= year_to
+            ):
+                mask |= bitmap
+        return mask
+
+    def filter(
+        self,
+        filters: Dict[str, Iterable[str]],
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        page: int = 1,
+        limit: int = 20,
+    ) -> Dict:
+        """Matching page plus facet counts: {"items", "total", "facets"}"""
+        masks = {}
+        for facet in FACETS:
+            values = filters.get(facet)
+            if values:
+                mask = 0
+                for value in values:
+                    mask |= self._bitmaps[facet].get(value, 0)
+                masks[facet] = mask
+        if year_from is not None or year_to is not None:
+            masks["year"] = self._year_mask(year_from, year_to)
+
+        def combined(exclude: Optional[str] = None) -> int:
+            result = self._all
+            for facet, mask in masks.items():
+                if facet != exclude:
+                    result &= mask
+            return result
+
+        matched = combined()
+        facets = {}
+        for facet, bitmaps in (*self._bitmaps.items(), ("year", self._years)):
+            base = combined(exclude=facet)
+            counts = {
+                value: (bitmap & base).bit_count() for value, bitmap in bitmaps.items()
+            }
+            facets[facet] = {value: count for value, count in counts.items() if count}
+
+        # Skip whole words of earlier pages by popcount, then walk the bits
+        # from the word where this page starts
+        skip = (page - 1) * limit
+        words = matched.to_bytes((matched.bit_length() + 7) // 8, "little")
+        start = 0
+        while start < len(words):
+            count = int.from_bytes(words[start : start + WORD_BYTES], "little")
+            count = count.bit_count()
+            if count > skip:
+                break
+            skip -= count
+            start += WORD_BYTES
+
+        items = []
+        offset = start * 8
+        remaining = matched >> offset
+        while remaining and len(items) < limit:
+            lowest = remaining & -remaining
+            remaining ^= lowest
+            if skip:
+                skip -= 1
+                continue
+            items.append(self._items[offset + lowest.bit_length() - 1])
+
+        return {"items": items, "total": matched.bit_count(), "facets": facets}
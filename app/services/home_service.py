@@ -0,0 +1,122 @@
+"""
+Home page feed: catalog sections plus the user's recent history in one call
+File: app/services/home_service.py
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.watch_history import WatchHistory
+from app.schemas.watch_history import WatchHistoryResponse
+from app.services.kkphim_service import CachedData, kkphim_service
+from app.services.watch_service import progress_buffer
+
+logger = logging.getLogger(__name__)
+
+# name -> (fetch, path to the item list in the upstream payload). The fetches
+# use the same arguments as the listing routes so they share cache keys.
+HOME_SECTIONS: Dict[str, Tuple[Callable[[], Awaitable[Any]], Tuple[str, ...]]] = {
+    "new_releases": (lambda: kkphim_service.get_new_movies(page=1), ("items",)),
+    "movies": (lambda: kkphim_service.get_movies(page=1), ("data", "items")),
+    "series": (lambda: kkphim_service.get_series(page=1), ("data", "items")),
+}
+
+
+async def _with_timeout(name: str, coro: Awaitable[Any]) -> Any:
+    """Run one section; a slow or failing section yields None on its own"""
+    try:
+        return await asyncio.wait_for(coro, settings.HOME_SECTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Home feed: section %s timed out", name)
+    except Exception as e:
+        logger.warning("Home feed: section %s failed: %s", name, e)
+    return None
+
+
+def _items(result: Optional[Dict], path: Tuple[str, ...]) -> Optional[List]:
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result[: settings.HOME_SECTION_SIZE] if isinstance(result, list) else None
+
+
+async def _flush_pending_progress(user_id: int):
+    """
+    Same as GET /users/watch-history: pending heartbeats first. Run outside
+    the section timeouts, since cancelling a flush midway could drop
+    heartbeats already taken from the buffer.
+    """
+    try:
+        async with AsyncSessionLocal() as db:
+            await progress_buffer.flush_user(db, user_id)
+    except Exception as e:
+        logger.warning("Home feed: progress flush failed: %s", e)
+
+
+async def get_recent_history(user_id: int) -> List[dict]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(WatchHistory)
+            .where(WatchHistory.user_id == user_id)
+            .order_by(WatchHistory.last_watched.desc(), WatchHistory.id.desc())
+            .limit(settings.HOME_SECTION_SIZE)
+        )
+        return [
+            WatchHistoryResponse.model_validate(row).model_dump(mode="json")
+            for row in result.scalars().all()
+        ]
+
+
+async def get_home_feed(user_id: Optional[int] = None) -> CachedData:
+    """
+    Fetch every home section concurrently and assemble one payload.
+
+    Sections that fail or exceed HOME_SECTION_TIMEOUT come back as None and
+    are listed under "degraded". A complete feed carries an ETag derived
+    from the section ETags (plus the history for a signed-in user) and stays
+    fresh until the first section goes stale; a degraded one has no ETag so
+    it is never cached.
+    """
+    if user_id is not None:
+        await _flush_pending_progress(user_id)
+
+    names = list(HOME_SECTIONS)
+    tasks = [_with_timeout(name, HOME_SECTIONS[name][0]()) for name in names]
+    if user_id is not None:
+        tasks.append(_with_timeout("continue_watching", get_recent_history(user_id)))
+    results = await asyncio.gather(*tasks)
+
+    sections = {
+        name: _items(result, HOME_SECTIONS[name][1])
+        for name, result in zip(names, results)
+    }
+    if user_id is not None:
+        sections["continue_watching"] = results[-1]
+
+    new_releases = sections["new_releases"]
+    feed = CachedData(
+        {
+            "hero": new_releases[0] if new_releases else None,
+            "sections": sections,
+            "degraded": [name for name, items in sections.items() if items is None],
+        }
+    )
+    if feed["degraded"]:
+        return feed
+
+    validators = [getattr(result, "etag", None) for result in results[: len(names)]]
+    if user_id is not None:
+        validators.append(json.dumps(sections["continue_watching"]))
+    if all(validators):
+        digest = hashlib.sha256("|".join(validators).encode()).hexdigest()
+        feed.etag = digest[:32]
+        feed.fresh_until = min(result.fresh_until for result in results[: len(names)])
+    return feed
@@ -3,28 +3,134 @@ Updated KKPhim Service based on official API documentation
 File: app/services/kkphim_service.py
 """
 
+import asyncio
+import hashlib
+import json
+import time
 import httpx
-from typing import Optional, Dict, Any, List
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Union, Callable, Awaitable
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
 from app.core.cache import cache
+from app.core.singleflight import SingleFlight
+from app.database import AsyncSessionLocal
+from app.models.catalog import Category, Country
+from app.services import catalog_service
+
+# Set by the cache warmer: entries going stale within this many seconds are
+# refreshed inline instead of being served as-is.
+refresh_ahead: ContextVar[float] = ContextVar("refresh_ahead", default=0.0)
+
+# Reads the local catalog mirror; returns None when it cannot answer
+MirrorLoader = Callable[[AsyncSession], Awaitable[Optional[Any]]]
+
+# SEO and site-chrome blocks of KKPhim responses that no route reads; they
+# are dropped before caching (at the top level and under "data").
+UNUSED_FIELDS = (
+    "seoOnPage",
+    "breadCrumb",
+    "titlePage",
+    "type_list",
+    "APP_DOMAIN_FRONTEND",
+    "APP_DOMAIN_CDN_IMAGE",
+)
+
+
+def trim_payload(data: Any) -> Any:
+    """Upstream response without the fields listed in UNUSED_FIELDS"""
+    if not isinstance(data, dict):
+        return data
+
+    trimmed = {key: value for key, value in data.items() if key not in UNUSED_FIELDS}
+    if isinstance(trimmed.get("data"), dict):
+        trimmed["data"] = {
+            key: value
+            for key, value in trimmed["data"].items()
+            if key not in UNUSED_FIELDS
+        }
+    return trimmed
+
+
+class CachedData(dict):
+    """Upstream payload plus the cache metadata used for HTTP caching"""
+
+    etag: Optional[str] = None
+    fresh_until: float = 0.0
+
+    @classmethod
+    def from_entry(cls, entry: Dict) -> Union["CachedData", "CachedList"]:
+        payload = entry["data"]
+        data = CachedList(payload) if isinstance(payload, list) else cls(payload)
+        data.etag = entry.get("etag")
+        data.fresh_until = entry["fresh_until"]
+        return data
+
+
+class CachedList(list):
+    """List payloads (/the-loai, /quoc-gia) with the same metadata as CachedData"""
+
+    etag: Optional[str] = None
+    fresh_until: float = 0.0
 
 
 class KKPhimService:
     def __init__(self):
         self.base_url = settings.KKPHIM_API_BASE_URL
         self.timeout = settings.KKPHIM_API_TIMEOUT
+        self._client: Optional[httpx.AsyncClient] = None
+        self.flights = SingleFlight()
+        self._background: set = set()
+
+    def _build_client(self) -> httpx.AsyncClient:
+        """Build the pooled client shared by every upstream call"""
+        timeout = httpx.Timeout(
+            self.timeout,
+            connect=settings.KKPHIM_API_CONNECT_TIMEOUT,
+            read=settings.KKPHIM_API_READ_TIMEOUT,
+            write=settings.KKPHIM_API_WRITE_TIMEOUT,
+            pool=settings.KKPHIM_API_POOL_TIMEOUT,
+        )
+        limits = httpx.Limits(
+            max_connections=settings.KKPHIM_API_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.KKPHIM_API_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.KKPHIM_API_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=limits,
+            http2=settings.KKPHIM_API_HTTP2,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client, created lazily if startup() has not run (e.g. scripts)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+        return self._client
+
+    async def startup(self):
+        """Open the shared HTTP client (called from the app lifespan)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._build_client()
+
+    async def shutdown(self):
+        """Close the shared HTTP client and its pooled connections"""
+        for task in list(self._background):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def _make_request(
         self, endpoint: str, params: Optional[Dict] = None
     ) -> Optional[Dict]:
-        """Make async request to KKPhim API"""
-        url = f"{self.base_url}{endpoint}"
-
+        """Make async request to KKPhim API over the pooled client"""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self.client.get(endpoint, params=params)
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             print(f"HTTP error occurred: {e}")
             return None
@@ -32,20 +138,127 @@ class KKPhimService:
             print(f"An error occurred: {e}")
             return None
 
+    async def fetch_live(
+        self, endpoint: str, params: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """Uncached upstream call (used by the catalog sync)"""
+        data = await self._make_request(endpoint, params)
+        return trim_payload(data) if data else None
+
+    async def _load_mirror(self, mirror: Optional[MirrorLoader]) -> Optional[Any]:
+        """Answer from the local catalog mirror when enabled, else None"""
+        if mirror is None or not settings.CATALOG_MIRROR_ENABLED:
+            return None
+        try:
+            async with AsyncSessionLocal() as db:
+                return await mirror(db)
+        except Exception as e:
+            print(f"Catalog mirror error: {e}")
+            return None
+
+    async def _cached_request(
+        self,
+        cache_key: str,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        ttl: Optional[int] = None,
+        mirror: Optional[MirrorLoader] = None,
+    ) -> Optional[Dict]:
+        """
+        Serve from cache, coalescing concurrent misses into one upstream call.
+
+        Entries are stored as {"data", "fresh_until", "etag"}: ttl is the soft
+        TTL and the Redis key lives CACHE_MAX_STALENESS longer. Past the soft
+        TTL the stale data is returned at once and refreshed in the
+        background; if upstream keeps failing it is served until the hard TTL
+        runs out. Hits come back as CachedData (CachedList for list payloads)
+        carrying the entry metadata. Misses are filled from the local catalog
+        mirror when `mirror` is given and CATALOG_MIRROR_ENABLED, else upstream.
+        """
+        entry = await cache.get(cache_key)
+        if entry and "fresh_until" in entry:
+            ahead = refresh_ahead.get()
+            if ahead and entry["fresh_until"] <= time.time() + ahead:
+                entry = (
+                    await self.flights.do(
+                        cache_key,
+                        lambda: self._fetch_and_cache(
+                            cache_key, endpoint, params, ttl, mirror
+                        ),
+                    )
+                    or entry
+                )
+            elif entry["fresh_until"] <= time.time():
+                self._refresh_in_background(cache_key, endpoint, params, ttl, mirror)
+            return CachedData.from_entry(entry)
+
+        entry = await self.flights.do(
+            cache_key,
+            lambda: self._fetch_and_cache(cache_key, endpoint, params, ttl, mirror),
+        )
+        return CachedData.from_entry(entry) if entry else None
+
+    async def _fetch_and_cache(
+        self,
+        cache_key: str,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        ttl: Optional[int] = None,
+        mirror: Optional[MirrorLoader] = None,
+    ) -> Optional[Dict]:
+        """Fetch (mirror first, then upstream) and store the cache entry"""
+        data = await self._load_mirror(mirror)
+        if not data:
+            data = await self._make_request(endpoint, params)
+        if not data:
+            return None
+
+        data = trim_payload(data)
+        ttl = ttl or settings.CACHE_TTL
+        payload = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        entry = {
+            "data": data,
+            "fresh_until": time.time() + ttl,
+            # Strong validator for conditional GETs on the API routes
+            "etag": hashlib.sha256(payload.encode()).hexdigest()[:32],
+        }
+        await cache.set(cache_key, entry, ttl=ttl + settings.CACHE_MAX_STALENESS)
+        return entry
+
+    def _refresh_in_background(
+        self,
+        cache_key: str,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        ttl: Optional[int] = None,
+        mirror: Optional[MirrorLoader] = None,
+    ):
+        """Start one refresh per key; a failed refresh leaves the stale entry"""
+        if self.flights.in_flight(cache_key):
+            return
+
+        task = asyncio.create_task(
+            self.flights.do(
+                cache_key,
+                lambda: self._fetch_and_cache(cache_key, endpoint, params, ttl, mirror),
+            )
+        )
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
     async def get_new_movies(self, page: int = 1) -> Optional[Dict]:
         """
         Get newly updated movies
         Endpoint: /danh-sach/phim-moi-cap-nhat
         """
         cache_key = f"new_movies:page:{page}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
-        data = await self._make_request(f"/danh-sach/phim-moi-cap-nhat", {"page": page})
-        if data:
-            cache.set(cache_key, data, ttl=300)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/danh-sach/phim-moi-cap-nhat",
+            {"page": page},
+            ttl=300,
+            mirror=lambda db: catalog_service.list_movies(db, page, v1=False),
+        )
 
     async def get_movies(self, page: int = 1, limit: int = 20) -> Optional[Dict]:
         """
@@ -53,15 +266,16 @@ class KKPhimService:
         Endpoint: /v1/api/danh-sach/phim-le
         """
         cache_key = f"movies:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/danh-sach/phim-le", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/danh-sach/phim-le",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(
+                db, page, limit, type=catalog_service.LIST_TYPES["phim-le"]
+            ),
+        )
 
     async def get_series(self, page: int = 1, limit: int = 20) -> Optional[Dict]:
         """
@@ -69,15 +283,16 @@ class KKPhimService:
         Endpoint: /v1/api/danh-sach/phim-bo
         """
         cache_key = f"series:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/danh-sach/phim-bo", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/danh-sach/phim-bo",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(
+                db, page, limit, type=catalog_service.LIST_TYPES["phim-bo"]
+            ),
+        )
 
     async def get_tv_shows(self, page: int = 1, limit: int = 20) -> Optional[Dict]:
         """
@@ -85,15 +300,16 @@ class KKPhimService:
         Endpoint: /v1/api/danh-sach/tv-shows
         """
         cache_key = f"tv_shows:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/danh-sach/tv-shows", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/danh-sach/tv-shows",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(
+                db, page, limit, type=catalog_service.LIST_TYPES["tv-shows"]
+            ),
+        )
 
     async def get_anime(self, page: int = 1, limit: int = 20) -> Optional[Dict]:
         """
@@ -101,15 +317,16 @@ class KKPhimService:
         Endpoint: /v1/api/danh-sach/hoat-hinh
         """
         cache_key = f"anime:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/danh-sach/hoat-hinh", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/danh-sach/hoat-hinh",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(
+                db, page, limit, type=catalog_service.LIST_TYPES["hoat-hinh"]
+            ),
+        )
 
     async def get_movie_detail(self, slug: str) -> Optional[Dict]:
         """
@@ -117,14 +334,21 @@ class KKPhimService:
         Endpoint: /phim/{slug}
         """
         cache_key = f"movie_detail:{slug}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return await self._cached_request(
+            cache_key,
+            f"/phim/{slug}",
+            ttl=1800,
+            mirror=lambda db: catalog_service.get_movie_detail(db, slug),
+        )
 
-        data = await self._make_request(f"/phim/{slug}")
-        if data:
-            cache.set(cache_key, data, ttl=1800)
-        return data
+    async def get_related(self, slug: str) -> Optional[List[dict]]:
+        """
+        Related titles precomputed in the catalog mirror (no upstream
+        equivalent); None when the mirror is disabled or has none
+        """
+        return await self._load_mirror(
+            lambda db: catalog_service.get_related(db, slug)
+        )
 
     async def search(
         self, keyword: str, page: int = 1, limit: int = 20
@@ -134,84 +358,76 @@ class KKPhimService:
         Endpoint: /v1/api/tim-kiem
         """
         cache_key = f"search:{keyword}:{page}:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"keyword": keyword, "page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/tim-kiem", params)
-        if data:
-            cache.set(cache_key, data, ttl=300)
-        return data
+        return await self._cached_request(
+            cache_key, f"/v1/api/tim-kiem", params, ttl=300
+        )
 
     async def get_by_category(
         self, category_slug: str, page: int = 1, limit: int = 20
     ) -> Optional[Dict]:
         """Get movies by category"""
         cache_key = f"category:{category_slug}:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/the-loai/{category_slug}", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/the-loai/{category_slug}",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(
+                db, page, limit, category=category_slug
+            ),
+        )
 
     async def get_by_country(
         self, country_slug: str, page: int = 1, limit: int = 20
     ) -> Optional[Dict]:
         """Get movies by country"""
         cache_key = f"country:{country_slug}:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/quoc-gia/{country_slug}", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/quoc-gia/{country_slug}",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(
+                db, page, limit, country=country_slug
+            ),
+        )
 
     async def get_by_year(
         self, year: int, page: int = 1, limit: int = 20
     ) -> Optional[Dict]:
         """Get movies by year"""
         cache_key = f"year:{year}:page:{page}:limit:{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
         params = {"page": page, "limit": limit}
-        data = await self._make_request(f"/v1/api/nam/{year}", params)
-        if data:
-            cache.set(cache_key, data, ttl=600)
-        return data
+        return await self._cached_request(
+            cache_key,
+            f"/v1/api/nam/{year}",
+            params,
+            ttl=600,
+            mirror=lambda db: catalog_service.list_movies(db, page, limit, year=year),
+        )
 
     async def get_categories(self) -> Optional[Dict]:
         """Get all categories"""
         cache_key = "categories"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
-        data = await self._make_request("/the-loai")
-        if data:
-            cache.set(cache_key, data, ttl=86400)
-        return data
+        return await self._cached_request(
+            cache_key,
+            "/the-loai",
+            ttl=86400,
+            mirror=lambda db: catalog_service.list_terms(db, Category),
+        )
 
     async def get_countries(self) -> Optional[Dict]:
         """Get all countries"""
         cache_key = "countries"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
-        data = await self._make_request("/quoc-gia")
-        if data:
-            cache.set(cache_key, data, ttl=86400)
-        return data
+        return await self._cached_request(
+            cache_key,
+            "/quoc-gia",
+            ttl=86400,
+            mirror=lambda db: catalog_service.list_terms(db, Country),
+        )
 
     async def convert_image_to_webp(self, image_url: str) -> str:
         """Convert image to WebP format"""
@@ -0,0 +1,197 @@
+"""
+Server-side rendering of the browse and movie detail pages, and the cache of
+prebuilt static page shells
+File: app/services/page_service.py
+"""
+
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.core.cache import LocalCache
+from app.core.http_cache import choose_encoding, compress, etag_matches
+from app.core.templates import templates
+from app.services.kkphim_service import kkphim_service
+
+logger = logging.getLogger(__name__)
+
+# Rendered HTML keyed by template, page/slug and the upstream ETag, so a
+# fragment lives exactly as long as the cache entry it was rendered from.
+fragment_cache = LocalCache(
+    settings.FRAGMENT_CACHE_MAX_ENTRIES, settings.FRAGMENT_CACHE_MAX_BYTES
+)
+
+# /browse/<kind> -> (listing fetch, card macro used by partials/browse_grid.html)
+BROWSE_PAGES = {
+    "movies": (kkphim_service.get_movies, "movie"),
+    "series": (kkphim_service.get_series, "series"),
+    "tv-shows": (kkphim_service.get_tv_shows, "series"),
+    "anime": (kkphim_service.get_anime, "movie"),
+}
+
+
+def render_fragment(template_name: str, key: str, result, **context: Any) -> str:
+    """Render a partial from a cached KKPhim result, reusing earlier renders"""
+    etag = getattr(result, "etag", None)
+    cache_key = f"{template_name}:{key}:{etag}"
+    html = fragment_cache.get(cache_key) if etag else None
+    if html is not None:
+        return html
+
+    html = templates.get_template(template_name).render(**context)
+    if etag:
+        remaining = max(result.fresh_until - time.time(), 0)
+        fragment_cache.set(
+            cache_key, html, len(html), remaining + settings.CACHE_MAX_STALENESS
+        )
+    return html
+
+
+async def browse_context(kind: str, page: int) -> Dict[str, Any]:
+    """
+    Template context for a server-rendered browse page.
+
+    Empty when SSR is off or the listing can't be fetched; the template then
+    falls back to the skeleton shell and the page script loads the grid.
+    """
+    context: Dict[str, Any] = {"page": page}
+    if not settings.SSR_ENABLED:
+        return context
+
+    fetch, card = BROWSE_PAGES[kind]
+    try:
+        result = await fetch(page=page)
+    except Exception as e:
+        logger.warning("SSR: /browse/%s page %d failed: %s", kind, page, e)
+        return context
+    if not result or result.get("status") != True:
+        return context
+
+    data = result.get("data") or {}
+    context["grid_html"] = render_fragment(
+        "partials/browse_grid.html",
+        f"{kind}:{page}",
+        result,
+        items=data.get("items", []),
+        card=card,
+    )
+    context["pagination"] = data.get("params", {}).get("pagination") or None
+    return context
+
+
+async def movie_detail_context(slug: str) -> Dict[str, Any]:
+    """Template context for a server-rendered movie detail page"""
+    context: Dict[str, Any] = {"slug": slug}
+    if not settings.SSR_ENABLED:
+        return context
+
+    try:
+        result = await kkphim_service.get_movie_detail(slug=slug)
+    except Exception as e:
+        logger.warning("SSR: /movie/%s failed: %s", slug, e)
+        return context
+    if not result or not result.get("movie"):
+        return context
+
+    movie = result["movie"]
+    context["page_title"] = movie.get("name")
+    context["detail_html"] = render_fragment(
+        "partials/movie_detail_body.html",
+        slug,
+        result,
+        movie=movie,
+        episodes=result.get("episodes", []),
+        slug=slug,
+    )
+    return context
+
+
+# Templates whose only context is the request; served as prebuilt shells
+STATIC_SHELLS = (
+    "home.html",
+    "login.html",
+    "register.html",
+    "search.html",
+    "profile.html",
+    "watch_history.html",
+    "favorites.html",
+)
+
+
+class PageShellCache:
+    """
+    Static page shells rendered once and served without touching Jinja.
+
+    Each shell is held as encoded HTML with a precomputed ETag; gzip / brotli
+    variants are built the first time a client asks for them. With
+    TEMPLATE_AUTO_RELOAD (dev mode) every shell is dropped as soon as any
+    file under the template directory changes.
+    """
+
+    def __init__(
+        self,
+        directory: str = "app/templates",
+        auto_reload: bool = settings.TEMPLATE_AUTO_RELOAD,
+    ):
+        self.directory = directory
+        self.auto_reload = auto_reload
+        self._shells: Dict[str, Dict[str, Any]] = {}
+        self._stamp: Optional[float] = None
+
+    def _templates_stamp(self) -> float:
+        latest = 0.0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime)
+        return latest
+
+    def _render(self, name: str) -> Dict[str, Any]:
+        body = templates.get_template(name).render().encode()
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        return {"etag": f'"{etag}"', "variants": {"identity": body}}
+
+    def warm(self, names: Iterable[str] = STATIC_SHELLS):
+        """Render shells up front (called from the app lifespan)"""
+        if self.auto_reload:
+            self._stamp = self._templates_stamp()
+        for name in names:
+            self._shells[name] = self._render(name)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        if self.auto_reload:
+            stamp = self._templates_stamp()
+            if stamp != self._stamp:
+                self._shells.clear()
+                self._stamp = stamp
+
+        shell = self._shells.get(name)
+        if shell is None:
+            shell = self._shells[name] = self._render(name)
+        return shell
+
+    def response(self, request: Request, name: str) -> Response:
+        shell = self.get(name)
+        headers = {
+            "ETag": shell["etag"],
+            # Shells only change on deploy, so revalidate instead of expiring
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(request.headers.get("if-none-match"), shell["etag"]):
+            return Response(status_code=304, headers=headers)
+
+        variants = shell["variants"]
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        if encoding not in variants:
+            variants[encoding] = compress(variants["identity"], encoding)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(variants[encoding], media_type="text/html", headers=headers)
+
+
+page_shells = PageShellCache()
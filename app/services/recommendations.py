@@ -0,0 +1,262 @@
+"""
+Batch job: "because you watched" recommendations per user
+File: app/services/recommendations.py
+
+Builds a user x item interaction matrix from watch_history and favorites,
+derives cosine item-item similarity from it, and stores each user's top-N
+unseen titles in user_recommendations. A full run recomputes the
+similarity and every user; between full runs only users with new activity
+are rescored against the last similarity matrix.
+    python -m app.services.recommendations [--once]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.models.catalog import Movie
+from app.models.favorite import Favorite
+from app.models.recommendation import UserRecommendation
+from app.models.watch_history import WatchHistory
+from app.services.catalog_service import list_item
+
+logger = logging.getLogger(__name__)
+
+# Interaction strength: a favorite counts as much as a few watched episodes
+FAVORITE_WEIGHT = 2.0
+
+# Users scored per block of R @ S
+BLOCK = 1024
+
+
+class RecommendationJob:
+    def __init__(
+        self,
+        top_n: int = settings.RECOMMENDATIONS_TOP_N,
+        interval: int = settings.RECOMMENDATIONS_INTERVAL,
+        full_interval: int = settings.RECOMMENDATIONS_FULL_INTERVAL,
+        overlap: int = settings.RECOMMENDATIONS_OVERLAP,
+    ):
+        self.top_n = top_n
+        self.interval = interval
+        self.full_interval = full_interval
+        self.overlap = timedelta(seconds=max(overlap, settings.PROGRESS_FLUSH_INTERVAL))
+        self.slugs: List[str] = []
+        self.columns: Dict[str, int] = {}
+        self.similarity: Optional[sparse.csr_matrix] = None
+        self.catalog: Dict[str, dict] = {}
+        self._since: Optional[datetime] = None
+
+    async def _interactions(
+        self, db, user_ids: Optional[Iterable[int]] = None
+    ) -> Dict[Tuple[int, str], float]:
+        """(user, slug) -> weight; also records display names for the slugs"""
+        watched = select(
+            WatchHistory.user_id,
+            WatchHistory.movie_slug,
+            func.count(),
+            func.max(WatchHistory.movie_name),
+        ).group_by(WatchHistory.user_id, WatchHistory.movie_slug)
+        favorites = select(
+            Favorite.user_id,
+            Favorite.movie_slug,
+            Favorite.movie_name,
+            Favorite.poster_url,
+        )
+        if user_ids is not None:
+            watched = watched.where(WatchHistory.user_id.in_(user_ids))
+            favorites = favorites.where(Favorite.user_id.in_(user_ids))
+
+        weights: Dict[Tuple[int, str], float] = {}
+        for user_id, slug, episodes, name in await db.execute(watched):
+            # More episodes of a title is more interest, with diminishing returns
+            weights[(user_id, slug)] = 1.0 + float(np.log1p(episodes))
+            self.catalog.setdefault(slug, {"slug": slug, "name": name})
+        for user_id, slug, name, poster_url in await db.execute(favorites):
+            key = (user_id, slug)
+            weights[key] = weights.get(key, 0.0) + FAVORITE_WEIGHT
+            self.catalog.setdefault(
+                slug, {"slug": slug, "name": name, "poster_url": poster_url}
+            )
+        return weights
+
+    def _matrix(
+        self, weights: Dict[Tuple[int, str], float]
+    ) -> Tuple[List[int], sparse.csr_matrix]:
+        """Users (row order) and their interaction rows over self.columns"""
+        users = sorted({user_id for user_id, _ in weights})
+        rows = {user_id: row for row, user_id in enumerate(users)}
+        entries = [
+            (rows[user_id], self.columns[slug], weight)
+            for (user_id, slug), weight in weights.items()
+            if slug in self.columns
+        ]
+        row, column, data = zip(*entries) if entries else ((), (), ())
+        matrix = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), (row, column)),
+            shape=(len(users), len(self.columns)),
+        )
+        return users, matrix
+
+    def _score(self, users: List[int], matrix: sparse.csr_matrix) -> List[dict]:
+        """Top-N unseen titles per user, each with the seen title behind it"""
+        top_n = min(self.top_n, len(self.slugs))
+        if top_n <= 0:
+            return [{"user_id": user_id, "items": []} for user_id in users]
+
+        rows = []
+        for start in range(0, len(users), BLOCK):
+            block = matrix[start : start + BLOCK]
+            scores = (block @ self.similarity).toarray()
+            scores[block.nonzero()] = 0  # already watched or favorited
+            best = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+            for offset, candidates in enumerate(best):
+                candidates = candidates[np.argsort(-scores[offset, candidates])]
+                candidates = candidates[scores[offset, candidates] > 0]
+                seen = block[offset]
+                items = []
+                if len(candidates):
+                    # Contribution of each seen title to each recommendation
+                    contributions = (
+                        self.similarity[seen.indices][:, candidates].toarray()
+                        * seen.data[:, None]
+                    )
+                    because = seen.indices[contributions.argmax(axis=0)]
+                    for column, source in zip(candidates, because):
+                        slug = self.slugs[column]
+                        items.append(
+                            dict(
+                                self.catalog.get(slug, {"slug": slug}),
+                                score=round(float(scores[offset, column]), 4),
+                                because=self.slugs[source],
+                            )
+                        )
+                rows.append({"user_id": users[start + offset], "items": items})
+        return rows
+
+    async def _store(self, db, rows: List[dict], user_ids: Optional[List[int]]):
+        now = datetime.utcnow()
+        if user_ids is None:
+            await db.execute(delete(UserRecommendation))
+        else:
+            await db.execute(
+                delete(UserRecommendation).where(
+                    UserRecommendation.user_id.in_(user_ids)
+                )
+            )
+        for start in range(0, len(rows), 1000):
+            await db.execute(
+                insert(UserRecommendation),
+                [dict(row, computed_at=now) for row in rows[start : start + 1000]],
+            )
+        await db.commit()
+
+    async def run_full(self) -> Dict[str, float]:
+        """Recompute item similarity and every user's recommendations"""
+        started = time.perf_counter()
+        since = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            self.catalog = {}
+            weights = await self._interactions(db)
+            self.slugs = sorted({slug for _, slug in weights})
+            self.columns = {slug: column for column, slug in enumerate(self.slugs)}
+
+            # Mirrored titles get full listing items instead of just a name
+            result = await db.execute(
+                select(Movie)
+                .where(Movie.slug.in_(self.slugs))
+                .options(selectinload(Movie.categories), selectinload(Movie.countries))
+            )
+            for movie in result.scalars().all():
+                self.catalog[movie.slug] = list_item(movie)
+
+            users, matrix = self._matrix(weights)
+            # Cosine similarity between item columns, without self-similarity
+            norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+            norms[norms == 0] = 1
+            normalized = matrix @ sparse.diags(1 / norms)
+            similarity = (normalized.T @ normalized).tocsr()
+            similarity.setdiag(0)
+            similarity.eliminate_zeros()
+            self.similarity = similarity
+
+            rows = self._score(users, matrix)
+            await self._store(db, rows, None)
+
+        self._since = since
+        return {
+            "users": len(users),
+            "items": len(self.slugs),
+            "interactions": matrix.nnz,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    async def run_incremental(self) -> Dict[str, float]:
+        """Rescore users active since the last run against the last similarity"""
+        if self.similarity is None or self._since is None:
+            return await self.run_full()
+
+        started = time.perf_counter()
+        since = datetime.utcnow()
+        # Rows stamped before the last run can commit after it (flushed
+        # heartbeats, out-of-order transactions); rescoring a user twice is
+        # harmless, missing one is not
+        window = self._since - self.overlap
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(WatchHistory.user_id)
+                .where(WatchHistory.last_watched > window)
+                .union(select(Favorite.user_id).where(Favorite.added_at > window))
+            )
+            active = list(result.scalars().all())
+            if active:
+                users, matrix = self._matrix(await self._interactions(db, active))
+                await self._store(db, self._score(users, matrix), active)
+
+        self._since = since
+        return {
+            "users": len(active),
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+
+    async def run_forever(self):
+        last_full = 0.0
+        while True:
+            if time.monotonic() - last_full >= self.full_interval:
+                result = await self.run_full()
+                last_full = time.monotonic()
+            else:
+                result = await self.run_incremental()
+            logger.info("Recommendations: %s", result)
+            await asyncio.sleep(self.interval)
+
+
+recommendation_job = RecommendationJob()
+
+
+async def _main(once: bool):
+    try:
+        if once:
+            logger.info("Recommendations: %s", await recommendation_job.run_full())
+        else:
+            await recommendation_job.run_forever()
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute user recommendations")
+    parser.add_argument("--once", action="store_true", help="run a single full pass")
+    args = parser.parse_args()
+    asyncio.run(_main(args.once))
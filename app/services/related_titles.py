@@ -0,0 +1,164 @@
+"""
+Batch job: precompute "related titles" for every mirrored movie
+File: app/services/related_titles.py
+
+Movies become sparse feature vectors (categories, countries, actors,
+directors, year), IDF-weighted and L2-normalised, so a row-block of
+X @ X.T is the cosine similarity to every other title. The top-K of each
+row is stored in movie_related. Run after a catalog sync:
+    python -m app.services.related_titles [--top-k N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.database import AsyncSessionLocal, async_engine
+from app.models.catalog import Movie, MovieRelated
+from app.services.catalog_service import list_item
+from app.services.search_index import fold
+
+logger = logging.getLogger(__name__)
+
+# Weight of each feature group before IDF; shared cast/crew counts most
+FEATURE_WEIGHTS = {
+    "category": 1.0,
+    "country": 0.5,
+    "actor": 1.5,
+    "director": 1.5,
+    "year": 0.5,
+}
+
+# Upstream fills unknown cast/crew with placeholders that must not match
+PLACEHOLDERS = {"", "dang cap nhat", "updating", "n/a"}
+
+# Rows of X @ X.T computed at once; bounds the dense block to BLOCK x n
+BLOCK = 512
+
+
+def _features(movie: Movie) -> Dict[Tuple[str, str], float]:
+    features = {}
+    for group, terms in (("category", movie.categories), ("country", movie.countries)):
+        for term in terms:
+            features[(group, term.slug)] = FEATURE_WEIGHTS[group]
+    for group in ("actor", "director"):
+        for person in getattr(movie, group) or []:
+            name = fold(str(person)).strip()
+            if name not in PLACEHOLDERS:
+                features[(group, name)] = FEATURE_WEIGHTS[group]
+    if movie.year:
+        # Neighbouring years share a half-weight feature
+        features[("year", str(movie.year))] = FEATURE_WEIGHTS["year"]
+        for year in (movie.year - 1, movie.year + 1):
+            features.setdefault(("year", str(year)), FEATURE_WEIGHTS["year"] / 2)
+    return features
+
+
+def build_matrix(movies: List[Movie]) -> sparse.csr_matrix:
+    """IDF-weighted, row-normalised n_movies x n_features matrix"""
+    vocabulary: Dict[Tuple[str, str], int] = {}
+    indptr, indices, data = [0], [], []
+    for movie in movies:
+        for feature, weight in _features(movie).items():
+            indices.append(vocabulary.setdefault(feature, len(vocabulary)))
+            data.append(weight)
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), indices, indptr),
+        shape=(len(movies), max(len(vocabulary), 1)),
+    )
+    # Rare features (a director) say more than common ones (a big genre)
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1 + len(movies)) / (1 + document_frequency)) + 1
+    matrix = matrix.multiply(idf.astype(np.float32)).tocsr()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def top_neighbours(matrix: sparse.csr_matrix, top_k: int):
+    """Yield (row, neighbour rows, scores) with the best match first"""
+    n = matrix.shape[0]
+    top_k = min(top_k, n - 1)
+    if top_k <= 0:
+        return
+    transposed = matrix.T.tocsc()
+    for start in range(0, n, BLOCK):
+        stop = min(start + BLOCK, n)
+        scores = (matrix[start:stop] @ transposed).toarray()
+        rows = np.arange(stop - start)
+        scores[rows, rows + start] = -1  # never related to itself
+
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        best = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-best, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        for row in rows:
+            keep = best[row] > 0
+            yield start + row, candidates[row][keep], best[row][keep]
+
+
+async def rebuild_related(top_k: int = settings.RELATED_TOP_K) -> Dict[str, float]:
+    """Recompute and replace every movie_related row"""
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Movie)
+            .options(selectinload(Movie.categories), selectinload(Movie.countries))
+            .order_by(Movie.id)
+        )
+        movies = result.scalars().all()
+        items = [list_item(movie) for movie in movies]
+
+        matrix = build_matrix(movies)
+        now = datetime.utcnow()
+        rows = [
+            {
+                "movie_id": movies[row].id,
+                "items": [
+                    dict(items[neighbour], score=round(float(score), 4))
+                    for neighbour, score in zip(neighbours, scores)
+                ],
+                "computed_at": now,
+            }
+            for row, neighbours, scores in top_neighbours(matrix, top_k)
+        ]
+
+        await db.execute(delete(MovieRelated))
+        for start in range(0, len(rows), 1000):
+            await db.execute(insert(MovieRelated), rows[start : start + 1000])
+        await db.commit()
+
+    return {
+        "movies": len(movies),
+        "features": matrix.shape[1],
+        "stored": len(rows),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+async def _main(top_k: int):
+    try:
+        logger.info("Related titles: %s", await rebuild_related(top_k))
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute related titles")
+    parser.add_argument("--top-k", type=int, default=settings.RELATED_TOP_K)
+    args = parser.parse_args()
+    asyncio.run(_main(args.top_k))
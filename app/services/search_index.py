@@ -0,0 +1,449 @@
+"""
+In-process full-text search over the local catalog mirror
+File: app/services/search_index.py
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import re
+import sys
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.catalog import Movie
+from app.services.catalog_service import list_item
+from app.services.filter_index import FilterIndex
+
+logger = logging.getLogger(__name__)
+
+# Per-field weight of a matching token; a title hit outranks a cast hit
+FIELD_WEIGHTS = (("name", 3.0), ("origin_name", 2.0), ("actor", 1.0), ("director", 1.0))
+
+# Bonus when the whole folded query is the title, or starts it
+EXACT_BONUS = 5.0
+PREFIX_BONUS = 2.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: Optional[str]) -> str:
+    """Lowercase and strip Vietnamese diacritics: "Người Nhện" -> "nguoi nhen" """
+    if not text:
+        return ""
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+class PrefixIndex:
+    """
+    Title completions by popularity from a sorted array of folded keys.
+
+    Every word start of a title (and of its original title) is a key, so
+    "nhen" completes "Người Nhện". A prefix maps to a contiguous range
+    found by binary search; short prefixes, whose ranges are the largest,
+    have their top-K precomputed so no lookup scans more than a few
+    hundred keys.
+    """
+
+    # Word starts indexed per title; bounds keys (and memory) per movie
+    MAX_KEYS_PER_TITLE = 8
+    # Prefixes up to this many characters are answered from precomputed lists
+    PRECOMPUTED_DEPTH = 3
+
+    def __init__(self, top_k: int = settings.SUGGEST_TOP_K):
+        self.top_k = top_k
+        self._keys: List[str] = []
+        self._ids = array("l")
+        self._views: Dict[int, int] = {}
+        self._items: Dict[int, dict] = {}
+        self._title_keys: Dict[int, List[str]] = {}
+        self._top: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _index_entry(self, movie_id: int, item: dict, views: int) -> List[str]:
+        """Record one title's display item and views; returns its keys"""
+        self._views[movie_id] = views
+        self._items[movie_id] = {
+            field: item.get(field)
+            for field in ("slug", "name", "origin_name", "year", "poster_url")
+        }
+        starts = set()
+        for text in (item.get("name"), item.get("origin_name")):
+            tokens = tokenize(text)
+            for i in range(len(tokens)):
+                starts.add(" ".join(tokens[i:]))
+        keys = sorted(starts, key=len, reverse=True)[: self.MAX_KEYS_PER_TITLE]
+        self._title_keys[movie_id] = keys
+        return keys
+
+    def _prefixes(self, key: str) -> List[str]:
+        depth = min(len(key), self.PRECOMPUTED_DEPTH)
+        return [key[:length] for length in range(1, depth + 1)]
+
+    def build(self, entries: Iterable[Tuple[int, dict, int]]):
+        """(Re)build from (movie id, listing item, views) triples"""
+        self._views, self._items, self._title_keys = {}, {}, {}
+        by_first: Dict[str, list] = defaultdict(list)
+        for movie_id, item, views in entries:
+            for key in self._index_entry(movie_id, item, views):
+                by_first[key[0]].append((key, movie_id))
+        # Same order as one big sort, but in short steps: a single sort holds
+        # the GIL (and stalls the event loop) for the whole build thread
+        keyed = []
+        for first in sorted(by_first):
+            keyed.extend(sorted(by_first[first]))
+
+        by_prefix: Dict[str, set] = defaultdict(set)
+        for key, movie_id in keyed:
+            for prefix in self._prefixes(key):
+                by_prefix[prefix].add(movie_id)
+
+        self._keys = [key for key, _ in keyed]
+        self._ids = array("l", (movie_id for _, movie_id in keyed))
+        self._top = {
+            prefix: heapq.nlargest(self.top_k, ids, key=self._views.__getitem__)
+            for prefix, ids in by_prefix.items()
+        }
+
+    def copy(self) -> "PrefixIndex":
+        """Independent copy to patch with update() while this one serves"""
+        clone = PrefixIndex(self.top_k)
+        clone._keys = list(self._keys)
+        clone._ids = array("l", self._ids)
+        clone._views = dict(self._views)
+        clone._items = dict(self._items)
+        clone._title_keys = dict(self._title_keys)
+        clone._top = dict(self._top)
+        return clone
+
+    def update(
+        self,
+        entries: Iterable[Tuple[int, dict, int]],
+        removed: Iterable[int] = (),
+    ):
+        """
+        Re-index changed titles and drop removed ones in place. Only the
+        precomputed lists of prefixes those titles had or now have are
+        touched: new titles are merged into them, and a list is recomputed
+        from its range of the sorted keys only when one of its titles left
+        the prefix or lost views.
+        """
+        entries = list(entries)
+        before: Dict[str, set] = defaultdict(set)
+        old_views = {}
+        for movie_id in [movie_id for movie_id, _, _ in entries] + list(removed):
+            for key in self._title_keys.pop(movie_id, []):
+                for prefix in self._prefixes(key):
+                    before[prefix].add(movie_id)
+                i = bisect_left(self._keys, key)
+                while self._ids[i] != movie_id:
+                    i += 1
+                del self._keys[i]
+                del self._ids[i]
+            old_views[movie_id] = self._views.pop(movie_id, 0)
+            self._items.pop(movie_id, None)
+
+        after: Dict[str, set] = defaultdict(set)
+        for movie_id, item, views in entries:
+            for key in self._index_entry(movie_id, item, views):
+                for prefix in self._prefixes(key):
+                    after[prefix].add(movie_id)
+                i = bisect_left(self._keys, key)
+                self._keys.insert(i, key)
+                self._ids.insert(i, movie_id)
+
+        for prefix in before.keys() | after.keys():
+            top = self._top.get(prefix, [])
+            dropped = any(
+                movie_id not in after[prefix]
+                or self._views[movie_id] < old_views[movie_id]
+                for movie_id in before[prefix].intersection(top)
+            )
+            candidates = self._range(prefix) if dropped else set(top) | after[prefix]
+            if candidates:
+                self._top[prefix] = heapq.nlargest(
+                    self.top_k, candidates, key=self._views.__getitem__
+                )
+            else:
+                self._top.pop(prefix, None)
+
+    def _range(self, prefix: str) -> set:
+        """Ids of every title with a key starting with `prefix`"""
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        return set(self._ids[lo:hi])
+
+    def suggest(self, query: str, limit: Optional[int] = None) -> List[dict]:
+        limit = min(limit or self.top_k, self.top_k)
+        prefix = " ".join(tokenize(query))
+        if not prefix:
+            return []
+
+        if len(prefix) <= self.PRECOMPUTED_DEPTH:
+            ids = self._top.get(prefix, [])[:limit]
+        else:
+            ids = heapq.nlargest(
+                limit, self._range(prefix), key=self._views.__getitem__
+            )
+        return [self._items[movie_id] for movie_id in ids]
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint of the keys, ids, items and precomputed lists"""
+        size = sys.getsizeof(self._keys) + sum(map(sys.getsizeof, self._keys))
+        size += sys.getsizeof(self._ids) + sys.getsizeof(self._views)
+        size += sys.getsizeof(self._items) + sum(
+            sys.getsizeof(item) + sum(map(sys.getsizeof, item.values()))
+            for item in self._items.values()
+        )
+        size += sys.getsizeof(self._title_keys) + sum(
+            map(sys.getsizeof, self._title_keys.values())
+        )
+        size += sys.getsizeof(self._top) + sum(
+            sys.getsizeof(prefix) + sys.getsizeof(ids)
+            for prefix, ids in self._top.items()
+        )
+        return size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "titles": len(self._items),
+            "keys": len(self._keys),
+            "precomputed_prefixes": len(self._top),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class SearchIndex:
+    """
+    Inverted index of folded tokens -> {movie id: field weight}.
+
+    Built from the mirror and kept current by re-indexing movies whose
+    synced_at is newer than the last refresh, at most once per
+    SEARCH_INDEX_REFRESH_INTERVAL. Queries AND their tokens and rank by
+    IDF-weighted field matches plus a title bonus, then by views.
+
+    The prefix and filter indexes are brought up to date by a background
+    task: each is rebuilt (or, for a few changed titles, the prefix index
+    is patched on a copy) in a worker thread and swapped in whole, so
+    requests never wait on them.
+    """
+
+    # Up to this many changed titles are patched into a copy of the prefix
+    # index; past it a full rebuild is cheaper
+    INCREMENTAL_LIMIT = 200
+
+    def __init__(self, refresh_interval: int = settings.SEARCH_INDEX_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.items: Dict[int, dict] = {}
+        self.titles: Dict[int, Tuple[str, int]] = {}  # id -> (folded name, views)
+        self._tokens: Dict[int, List[str]] = {}
+        # Derived indexes, updated in the background after a refresh finds changes
+        self.suggestions = PrefixIndex()
+        self.filters = FilterIndex()
+        self._synced_at: Optional[datetime] = None
+        # Movies already indexed at exactly _synced_at (the refresh boundary)
+        self._boundary_ids: Set[int] = set()
+        self._checked = 0.0
+        self._lock = asyncio.Lock()
+        self._pending: Set[int] = set()  # Changed ids not yet in the derived ones
+        self._derived_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def remove(self, movie_id: int):
+        for token in self._tokens.pop(movie_id, []):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(movie_id, None)
+                if not postings:
+                    del self.postings[token]
+        self.items.pop(movie_id, None)
+        self.titles.pop(movie_id, None)
+
+    def add(self, movie: Movie):
+        """(Re-)index one mirrored movie"""
+        self.remove(movie.id)
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS:
+            value = getattr(movie, field)
+            if isinstance(value, list):
+                value = " ".join(str(part) for part in value)
+            for token in tokenize(value):
+                weights[token] = max(weights.get(token, 0.0), weight)
+
+        for token, weight in weights.items():
+            self.postings[token][movie.id] = weight
+        self._tokens[movie.id] = list(weights)
+        self.items[movie.id] = list_item(movie)
+        self.titles[movie.id] = (" ".join(tokenize(movie.name)), movie.view or 0)
+
+    async def refresh(self, force: bool = False) -> int:
+        """Index movies synced since the last refresh; returns how many"""
+        if not force and time.monotonic() - self._checked < self.refresh_interval:
+            return 0
+        async with self._lock:
+            if not force and time.monotonic() - self._checked < self.refresh_interval:
+                return 0
+            query = select(Movie).options(
+                selectinload(Movie.categories), selectinload(Movie.countries)
+            )
+            if self._synced_at is not None:
+                # Rows written in the same instant as the watermark but not
+                # yet seen still match; the ones already indexed don't
+                query = query.where(
+                    or_(
+                        Movie.synced_at > self._synced_at,
+                        and_(
+                            Movie.synced_at == self._synced_at,
+                            Movie.id.notin_(self._boundary_ids),
+                        ),
+                    )
+                )
+            async with AsyncSessionLocal() as db:
+                movies = (await db.execute(query)).scalars().all()
+            self._checked = time.monotonic()
+            if not movies:
+                return 0
+
+            for movie in movies:
+                self.add(movie)
+            latest = max(
+                (movie.synced_at for movie in movies if movie.synced_at),
+                default=None,
+            )
+            if latest is not None:
+                if latest != self._synced_at:
+                    self._synced_at = latest
+                    self._boundary_ids = set()
+                self._boundary_ids.update(
+                    movie.id for movie in movies if movie.synced_at == latest
+                )
+
+            self._pending.update(movie.id for movie in movies)
+            if self._derived_task is None or self._derived_task.done():
+                self._derived_task = asyncio.create_task(self._update_derived())
+            return len(movies)
+
+    async def wait_for_derived(self):
+        """Wait until the derived indexes include every refreshed movie"""
+        while self._derived_task is not None and not self._derived_task.done():
+            await self._derived_task
+
+    async def _update_derived(self):
+        while self._pending:
+            changed, self._pending = self._pending, set()
+            try:
+                await self._update_suggestions(changed)
+                await self._update_filters()
+            except Exception as e:
+                # Retried with the next refresh that finds changes
+                self._pending.update(changed)
+                logger.warning("Search index: derived update failed: %s", e)
+                return
+
+    async def _update_suggestions(self, changed: Set[int]):
+        # Snapshot on the event loop; refreshes during the build only add to
+        # _pending, which the next pass applies to the new index
+        if len(self.suggestions) and len(changed) <= self.INCREMENTAL_LIMIT:
+            entries = [
+                (movie_id, self.items[movie_id], self.titles[movie_id][1])
+                for movie_id in changed
+                if movie_id in self.items
+            ]
+            removed = [movie_id for movie_id in changed if movie_id not in self.items]
+            current = self.suggestions
+
+            def build():
+                suggestions = current.copy()
+                suggestions.update(entries, removed)
+                return suggestions
+
+        else:
+            entries = [
+                (movie_id, item, self.titles[movie_id][1])
+                for movie_id, item in self.items.items()
+            ]
+
+            def build():
+                suggestions = PrefixIndex(self.suggestions.top_k)
+                suggestions.build(entries)
+                logger.info("Suggest index: %s", suggestions.stats())
+                return suggestions
+
+        self.suggestions = await asyncio.to_thread(build)
+
+    async def _update_filters(self):
+        # Bit positions follow the global listing order, so any change
+        # means a rebuild
+        items = list(self.items.values())
+
+        def build():
+            filters = FilterIndex()
+            filters.build(items)
+            return filters
+
+        self.filters = await asyncio.to_thread(build)
+
+    def search(self, query: str, page: int = 1, limit: int = 20) -> Dict:
+        """Ranked, paginated matches: {"items", "total"}"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return {"items": [], "total": 0}
+
+        # Intersect starting from the rarest token
+        postings = sorted((self.postings.get(token, {}) for token in tokens), key=len)
+        if not postings[0]:
+            return {"items": [], "total": 0}
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return {"items": [], "total": 0}
+
+        total_docs = len(self.items)
+        phrase = " ".join(tokens)
+        scored = []
+        for movie_id in candidates:
+            score = sum(
+                posting[movie_id] * math.log(1 + total_docs / len(posting))
+                for posting in postings
+            )
+            title, views = self.titles[movie_id]
+            if title == phrase:
+                score += EXACT_BONUS
+            elif title.startswith(phrase):
+                score += PREFIX_BONUS
+            scored.append((-score, -views, movie_id))
+        scored.sort()
+
+        start = (page - 1) * limit
+        return {
+            "items": [
+                self.items[movie_id] for _, _, movie_id in scored[start : start + limit]
+            ],
+            "total": len(scored),
+        }
+
+
+search_index = SearchIndex()
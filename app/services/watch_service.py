@@ -0,0 +1,312 @@
+"""
+Watch history persistence helpers
+File: app/services/watch_service.py
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from redis.exceptions import WatchError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.cache import cache
+from app.database import AsyncSessionLocal, UPSERT_DIALECTS
+from app.models.watch_history import WatchHistory, WATCH_HISTORY_CONFLICT_TARGET
+from app.schemas.watch_history import WatchHistoryCreate
+
+logger = logging.getLogger(__name__)
+
+
+def _upsert_statement(insert, rows: List[dict]):
+    stmt = insert(WatchHistory).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=WATCH_HISTORY_CONFLICT_TARGET,
+        set_={
+            "movie_name": stmt.excluded.movie_name,
+            "episode_name": stmt.excluded.episode_name,
+            "progress": stmt.excluded.progress,
+            "last_watched": stmt.excluded.last_watched,
+        },
+    )
+
+
+async def upsert_watch_history(
+    db: AsyncSession, user_id: int, history_data: WatchHistoryCreate
+) -> WatchHistory:
+    """
+    Insert or update a progress row in a single statement:
+    INSERT ... ON CONFLICT (user, movie, episode) DO UPDATE ... RETURNING
+    """
+    values = {
+        **history_data.dict(),
+        "user_id": user_id,
+        "last_watched": datetime.utcnow(),
+    }
+
+    insert = UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if insert is None:
+        history = await _select_then_write(db, values)
+    else:
+        stmt = _upsert_statement(insert, [values]).returning(WatchHistory)
+        result = await db.execute(stmt, execution_options={"populate_existing": True})
+        history = result.scalars().one()
+
+    await db.commit()
+    return history
+
+
+async def bulk_upsert_watch_history(db: AsyncSession, rows: List[dict]):
+    """Write many progress rows (at most one per key) with batched upserts"""
+    insert = UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if insert is None:
+        for values in rows:
+            await _select_then_write(db, values)
+    else:
+        batch = settings.PROGRESS_FLUSH_BATCH
+        for start in range(0, len(rows), batch):
+            await db.execute(_upsert_statement(insert, rows[start : start + batch]))
+    await db.commit()
+
+
+async def _select_then_write(db: AsyncSession, values: dict) -> WatchHistory:
+    """
+    Fallback for dialects without ON CONFLICT support. A concurrent insert
+    of the same key trips the unique index; the insert is then retried as
+    an update of the row that won.
+    """
+    history = await _find_watch_history(db, values)
+    if history is None:
+        try:
+            async with db.begin_nested():
+                history = WatchHistory(**values)
+                db.add(history)
+        except IntegrityError:
+            history = await _find_watch_history(db, values)
+        else:
+            return history
+
+    for field, value in values.items():
+        setattr(history, field, value)
+    await db.flush()
+    return history
+
+
+async def _find_watch_history(
+    db: AsyncSession, values: dict
+) -> Optional[WatchHistory]:
+    user_id, movie_slug, episode_slug = WATCH_HISTORY_CONFLICT_TARGET
+    result = await db.execute(
+        select(WatchHistory).where(
+            user_id == values["user_id"],
+            movie_slug == values["movie_slug"],
+            episode_slug == (values["episode_slug"] or ""),
+        )
+    )
+    return result.scalars().first()
+
+
+class ProgressBuffer:
+    """
+    Write-behind buffer for player progress heartbeats.
+
+    Only the latest heartbeat per (user, movie, episode) is kept. Entries
+    live in a Redis hash per user (shared by all workers) when the cache is
+    enabled, otherwise in process memory, and are written to the DB in bulk
+    every PROGRESS_FLUSH_INTERVAL seconds.
+    """
+
+    USERS_KEY = "watch_progress:users"
+
+    def __init__(self, interval: int = settings.PROGRESS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._local: Dict[int, Dict[str, dict]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"watch_progress:{user_id}"
+
+    @staticmethod
+    def _field(values: dict) -> str:
+        return f"{values['movie_slug']}\x1f{values['episode_slug'] or ''}"
+
+    @staticmethod
+    def _encode(values: dict) -> str:
+        encoded = dict(values, last_watched=values["last_watched"].isoformat())
+        encoded.pop("user_id", None)
+        return json.dumps(encoded)
+
+    @staticmethod
+    def _decode(user_id: int, raw: str) -> dict:
+        values = json.loads(raw)
+        values["user_id"] = user_id
+        values["last_watched"] = datetime.fromisoformat(values["last_watched"])
+        return values
+
+    async def add(self, user_id: int, history_data: WatchHistoryCreate):
+        values = {**history_data.dict(), "last_watched": datetime.utcnow()}
+        redis_client = cache.redis_client
+        if redis_client is None:
+            self._local.setdefault(user_id, {})[self._field(values)] = {
+                **values,
+                "user_id": user_id,
+            }
+            return
+
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    self._user_key(user_id), self._field(values), self._encode(values)
+                )
+                pipe.sadd(self.USERS_KEY, user_id)
+                await pipe.execute()
+        except Exception as e:
+            # Redis is down: write this heartbeat straight through instead
+            logger.warning("Progress buffer: Redis write failed: %s", e)
+            async with AsyncSessionLocal() as db:
+                await upsert_watch_history(db, user_id, history_data)
+
+    async def _take(self, user_id: int) -> List[dict]:
+        """Atomically remove and return one user's buffered heartbeats"""
+        redis_client = cache.redis_client
+        if redis_client is None:
+            return list(self._local.pop(user_id, {}).values())
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self._user_key(user_id))
+            pipe.delete(self._user_key(user_id))
+            entries, _ = await pipe.execute()
+        return [self._decode(user_id, raw) for raw in entries.values()]
+
+    async def _restore(self, rows: List[dict]):
+        """
+        Put back rows from a failed flush. A heartbeat buffered meanwhile for
+        the same (movie, episode) is kept if it is newer than the restored row.
+        """
+        redis_client = cache.redis_client
+        for values in rows:
+            user_id, field = values["user_id"], self._field(values)
+            if redis_client is None:
+                pending = self._local.setdefault(user_id, {})
+                current = pending.get(field)
+                if current is None or current["last_watched"] < values["last_watched"]:
+                    pending[field] = values
+                continue
+
+            key = self._user_key(user_id)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        # Compare-and-set: retried if a heartbeat lands in between
+                        await pipe.watch(key)
+                        current = await pipe.hget(key, field)
+                        if (
+                            current is not None
+                            and self._decode(user_id, current)["last_watched"]
+                            >= values["last_watched"]
+                        ):
+                            await pipe.reset()
+                            break
+                        pipe.multi()
+                        pipe.hset(key, field, self._encode(values))
+                        pipe.sadd(self.USERS_KEY, user_id)
+                        await pipe.execute()
+                        break
+                    except WatchError:
+                        continue
+
+    @classmethod
+    def _newest(cls, rows: List[dict]) -> List[dict]:
+        """One row per (user, movie, episode): the latest heartbeat"""
+        newest: Dict[tuple, dict] = {}
+        for values in rows:
+            key = (values["user_id"], cls._field(values))
+            current = newest.get(key)
+            if current is None or current["last_watched"] < values["last_watched"]:
+                newest[key] = values
+        return list(newest.values())
+
+    async def _write(self, rows: List[dict]) -> int:
+        # A batch may not hit the same row twice ("ON CONFLICT DO UPDATE
+        # command cannot affect row a second time" on PostgreSQL)
+        rows = self._newest(rows)
+        if not rows:
+            return 0
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await bulk_upsert_watch_history(db, rows)
+        except Exception:
+            await self._restore(rows)
+            raise
+        return len(rows)
+
+    async def flush_user(self, db: AsyncSession, user_id: int):
+        """Write one user's pending heartbeats so a read sees them"""
+        rows = await self._take(user_id)
+        if rows:
+            try:
+                await bulk_upsert_watch_history(db, rows)
+            except BaseException:
+                # Cancellation too (a request timeout or disconnect): the rows
+                # are already out of the buffer and must go back before it ends
+                try:
+                    await self._restore(rows)
+                finally:
+                    await db.rollback()
+                raise
+
+    async def flush(self) -> int:
+        """Drain every user's buffer to the DB; returns the number of rows"""
+        redis_client = cache.redis_client
+        if redis_client is None:
+            user_ids = list(self._local)
+        else:
+            # A heartbeat during the loop can re-add a user already popped
+            user_ids = set()
+            while True:
+                popped = await redis_client.spop(self.USERS_KEY, 1000)
+                if not popped:
+                    break
+                user_ids.update(int(user_id) for user_id in popped)
+
+        rows = []
+        for user_id in user_ids:
+            rows.extend(await self._take(user_id))
+        return await self._write(rows)
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                written = await self.flush()
+                if written:
+                    logger.info("Progress buffer: flushed %d rows", written)
+            except Exception as e:
+                logger.warning("Progress buffer: flush failed: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Progress buffer: final flush failed: %s", e)
+
+
+progress_buffer = ProgressBuffer()
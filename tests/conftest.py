@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# app.config reads these at import time; point the app at a throwaway DB
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault(
+    "DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="streaming-tests-"), "app.db"),
+)
+os.environ.setdefault("CACHE_ENABLED", "false")
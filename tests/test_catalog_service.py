@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models.catalog import Movie
+from app.services import catalog_service
+
+
+def test_list_movies_falls_back_outside_mirror_coverage(tmp_path):
+    """None (serve upstream) before a full sync and past the last page"""
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'mirror.db'}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        now = datetime.utcnow()
+        async with sessions() as db:
+            db.add_all(
+                Movie(
+                    slug=f"movie-{i}",
+                    name=f"Movie {i}",
+                    type="single",
+                    modified=now - timedelta(minutes=i),
+                    data={},
+                )
+                for i in range(25)
+            )
+            await db.commit()
+
+            before_sync = await catalog_service.list_movies(db, 1, 20)
+            await catalog_service.set_full_synced_at(db, now)
+            await db.commit()
+            pages = [
+                await catalog_service.list_movies(db, page, 20) for page in (1, 2, 3)
+            ]
+            other_list = await catalog_service.list_movies(db, 1, 20, type="series")
+        await engine.dispose()
+        return before_sync, pages, other_list
+
+    before_sync, (first, second, past_end), other_list = asyncio.run(scenario())
+    assert before_sync is None
+    assert [item["slug"] for item in first["data"]["items"]][:2] == [
+        "movie-0",
+        "movie-1",
+    ]
+    assert len(second["data"]["items"]) == 5
+    assert second["data"]["params"]["pagination"]["totalPages"] == 2
+    assert past_end is None
+    assert other_list is None
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app.core.http_cache import cached_response, choose_encoding
+from app.services.kkphim_service import CachedData
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, "identity"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0.1, gzip;q=1.0", "gzip"),
+        ("gzip;q=0.5, br;q=0.5", "br"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "br"),
+        ("gzip;q=0.4, *;q=0.8", "br"),
+        ("*;q=0.5, br;q=0", "gzip"),
+        ("*;q=0", "identity"),
+        ("identity;q=1, gzip;q=0.5", "identity"),
+        ("gzip;q=0.5", "gzip"),
+        ("deflate", "identity"),
+        ("BR;Q=0.9, gzip;q=0.8", "br"),
+    ],
+)
+def test_choose_encoding_follows_q_values(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def _request(headers: dict) -> Request:
+    raw = [(name.encode(), value.encode()) for name, value in headers.items()]
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/v1/movies/new",
+            "query_string": b"page=1",
+            "headers": raw,
+        }
+    )
+
+
+def test_not_modified_carries_the_same_vary():
+    """A 304 revalidation sends the Vary of the full response"""
+    result = CachedData.from_entry(
+        {"data": {"items": []}, "etag": "abc", "fresh_until": time.time() + 60}
+    )
+    full = cached_response(_request({}), result, result)
+    revalidated = cached_response(_request({"if-none-match": '"abc"'}), result, result)
+
+    assert revalidated.status_code == 304
+    assert revalidated.headers["vary"] == full.headers["vary"] == "Accept-Encoding"
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.database import AsyncSessionLocal, Base, async_engine
+from app.models.favorite import Favorite  # noqa: F401 (User relationship)
+from app.models.recommendation import UserRecommendation
+from app.models.user import User
+from app.models.watch_history import WatchHistory
+from app.services.recommendations import RecommendationJob
+
+
+def test_incremental_run_picks_up_rows_committed_late():
+    """A row stamped before the last run but committed after it is rescored"""
+
+    async def watch(user_id: int, slug: str, at: datetime):
+        async with AsyncSessionLocal() as db:
+            db.add(
+                WatchHistory(
+                    user_id=user_id, movie_slug=slug, movie_name=slug, last_watched=at
+                )
+            )
+            await db.commit()
+
+    async def scenario():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            for user_id in (11, 12, 13):
+                db.add(
+                    User(
+                        id=user_id,
+                        email=f"r{user_id}@example.com",
+                        username=f"r{user_id}",
+                        hashed_password="x",
+                    )
+                )
+            await db.commit()
+        long_ago = datetime.utcnow() - timedelta(days=1)
+        for user_id, slug in ((11, "a"), (11, "b"), (12, "a")):
+            await watch(user_id, slug, long_ago)
+
+        async def computed_at(user_id: int):
+            async with AsyncSessionLocal() as db:
+                row = await db.get(UserRecommendation, user_id)
+            return row.computed_at if row else None
+
+        job = RecommendationJob(overlap=60)
+        await job.run_full()
+        # New activity moves the watermark past it
+        watched_at = datetime.utcnow()
+        await watch(11, "c", watched_at)
+        await job.run_incremental()
+        before = await computed_at(12)
+
+        # A buffered heartbeat stamped before that run, flushed after it
+        await watch(12, "b", watched_at - timedelta(seconds=5))
+        # Activity older than the overlap was covered by earlier runs
+        await watch(13, "a", job._since - timedelta(hours=1))
+        await job.run_incremental()
+        after = {user_id: await computed_at(user_id) for user_id in (12, 13)}
+        await async_engine.dispose()
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert after[12] > before
+    assert after[13] is None
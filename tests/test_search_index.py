@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.database import AsyncSessionLocal, Base, async_engine
+from app.models.catalog import Movie
+from app.services.filter_index import FilterIndex
+from app.services.search_index import PrefixIndex, SearchIndex
+
+
+def test_refresh_only_picks_up_unseen_rows():
+    """The watermark row is not re-indexed; new rows at its instant are"""
+    synced_at = datetime(2026, 1, 1)
+
+    async def add(slug: str, at: datetime):
+        async with AsyncSessionLocal() as db:
+            db.add(Movie(slug=slug, name=slug.title(), data={}, synced_at=at))
+            await db.commit()
+
+    async def scenario():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        index = SearchIndex()
+        for slug in ("alpha", "bravo"):
+            await add(slug, synced_at)
+
+        counts = [await index.refresh(force=True)]
+        counts.append(await index.refresh(force=True))
+        await add("charlie", synced_at)
+        counts.append(await index.refresh(force=True))
+        await add("delta", synced_at + timedelta(seconds=1))
+        counts.append(await index.refresh(force=True))
+        counts.append(await index.refresh(force=True))
+        await index.wait_for_derived()
+        await async_engine.dispose()
+        return index, counts
+
+    index, counts = asyncio.run(scenario())
+    assert counts == [2, 0, 1, 1, 0]
+    assert len(index) == 4
+    assert [item["slug"] for item in index.search("charlie")["items"]] == ["charlie"]
+    assert [item["slug"] for item in index.suggestions.suggest("del")] == ["delta"]
+    assert index.filters.filter({})["total"] == 4
+
+
+def _entry(movie_id: int, name: str, views: int):
+    return movie_id, {"slug": f"movie-{movie_id}", "name": name}, views
+
+
+def test_prefix_update_matches_a_rebuild():
+    """Patching changed titles answers the same as building from scratch"""
+    names = ["Người Nhện", "Nhà Trọ", "Người Vận Chuyển", "Thám Tử", "Nhật Ký"]
+    entries = {i: _entry(i, name, 10 * i) for i, name in enumerate(names)}
+    patched = PrefixIndex(top_k=3)
+    patched.build(entries.values())
+
+    # Renamed, more popular, less popular, and removed titles
+    changes = [_entry(0, "Thám Tử Lừng Danh", 0), _entry(3, "Nhện Độc", 100)]
+    changes.append(_entry(2, "Người Vận Chuyển", 1))
+    patched.update(changes, removed=[4])
+    for movie_id, item, views in changes:
+        entries[movie_id] = (movie_id, item, views)
+    del entries[4]
+    rebuilt = PrefixIndex(top_k=3)
+    rebuilt.build(entries.values())
+
+    for query in ("n", "ng", "nh", "nhe", "t", "tham tu", "nhat", "van chuyen"):
+        assert patched.suggest(query) == rebuilt.suggest(query), query
+    assert len(patched) == len(rebuilt) == 4
+
+
+def test_filter_pages_skip_whole_words():
+    """Deep pages start at the right bit after skipping words by popcount"""
+    items = [
+        {
+            "slug": f"movie-{i}",
+            "type": "series" if i % 3 else "single",
+            "modified": {"time": f"2026-01-01T00:00:{i:06d}"},
+        }
+        for i in range(1000)
+    ]
+    index = FilterIndex()
+    index.build(items)
+    series = [item for item in reversed(items) if item["type"] == "series"]
+
+    for page in (1, 4, 5, 33, 34, 35):
+        found = index.filter({"type": ["series"]}, page=page, limit=20)
+        assert found["items"] == series[(page - 1) * 20 : page * 20], page
+    assert found["total"] == len(series)
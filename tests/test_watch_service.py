@@ -0,0 +1,172 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import redis.asyncio as redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.cache import cache
+from app.database import AsyncSessionLocal, Base, async_engine
+from app.models.favorite import Favorite  # noqa: F401 (User relationship)
+from app.models.user import User
+from app.models.watch_history import WatchHistory
+from app.schemas.watch_history import WatchHistoryCreate
+from app.services import watch_service
+
+
+@pytest.mark.parametrize("upsert", [True, False], ids=["on-conflict", "fallback"])
+def test_concurrent_upserts_keep_one_row_with_latest_progress(
+    tmp_path, monkeypatch, upsert
+):
+    """Racing heartbeats for one (user, movie) never duplicate the row"""
+    if not upsert:
+        # Take the select-then-write path used by dialects without ON CONFLICT
+        monkeypatch.setattr(watch_service, "UPSERT_DIALECTS", {})
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'race.db'}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            db.add(User(id=1, email="u@example.com", username="u", hashed_password="x"))
+            await db.commit()
+
+        async def heartbeat(progress: float):
+            async with sessions() as db:
+                await watch_service.upsert_watch_history(
+                    db,
+                    1,
+                    WatchHistoryCreate(
+                        movie_slug="movie", movie_name="Movie", progress=progress
+                    ),
+                )
+
+        await asyncio.gather(*(heartbeat(float(i)) for i in range(100)))
+        # A later write wins regardless of how the racing ones interleaved
+        await heartbeat(1000.0)
+
+        async with sessions() as db:
+            count = await db.scalar(select(func.count()).select_from(WatchHistory))
+            progress = await db.scalar(select(WatchHistory.progress))
+        await engine.dispose()
+        return count, progress
+
+    count, progress = asyncio.run(scenario())
+    assert count == 1
+    assert progress == 1000.0
+
+
+def test_progress_heartbeat_is_written_through_when_redis_fails(monkeypatch):
+    """A Redis outage must not lose the heartbeat or fail the request"""
+    # Nothing listens on port 1, so every Redis command fails to connect
+    unreachable = redis.Redis(port=1, socket_connect_timeout=0.1)
+    monkeypatch.setattr(cache, "redis_client", unreachable)
+
+    async def scenario():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            db.add(User(id=2, email="p@example.com", username="p", hashed_password="x"))
+            await db.commit()
+
+        await watch_service.progress_buffer.add(
+            2, WatchHistoryCreate(movie_slug="movie", movie_name="Movie", progress=42.0)
+        )
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(WatchHistory.progress).where(WatchHistory.user_id == 2)
+            )
+            progress = result.scalars().all()
+        await unreachable.aclose()
+        await async_engine.dispose()
+        return progress
+
+    assert asyncio.run(scenario()) == [42.0]
+
+
+def _heartbeat(user_id: int, progress: float, at: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "movie_slug": "movie",
+        "movie_name": "Movie",
+        "episode_slug": "tap-1",
+        "episode_name": "Tap 1",
+        "progress": progress,
+        "last_watched": at,
+    }
+
+
+def test_flush_batch_keeps_newest_heartbeat_per_row():
+    """Duplicate keys in one batch collapse to the latest heartbeat"""
+    at = datetime(2026, 1, 1)
+
+    async def scenario():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            db.add(User(id=3, email="f@example.com", username="f", hashed_password="x"))
+            await db.commit()
+
+        buffer = watch_service.ProgressBuffer()
+        newer = _heartbeat(3, 90.0, at + timedelta(seconds=30))
+        written = await buffer._write([newer, _heartbeat(3, 60.0, at)])
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(WatchHistory.progress).where(WatchHistory.user_id == 3)
+            )
+            progress = result.scalars().all()
+        await async_engine.dispose()
+        return written, progress
+
+    assert asyncio.run(scenario()) == (1, [90.0])
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_restore_never_replaces_a_newer_heartbeat(monkeypatch, backend):
+    """A failed flush puts rows back only where nothing newer arrived"""
+    if backend == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        monkeypatch.setattr(cache, "redis_client", fakeredis.FakeAsyncRedis())
+    else:
+        monkeypatch.setattr(cache, "redis_client", None)
+    at = datetime(2026, 1, 1)
+
+    async def scenario():
+        buffer = watch_service.ProgressBuffer()
+        # Heartbeats buffered while the flush of the other rows was failing
+        await buffer.add(
+            4, WatchHistoryCreate(movie_slug="movie", movie_name="Movie", progress=5.0)
+        )
+        stale = dict(_heartbeat(4, 1.0, at), episode_slug=None, episode_name=None)
+        await buffer._restore([stale, _heartbeat(4, 7.0, at)])
+        await buffer._restore([_heartbeat(4, 8.0, at + timedelta(seconds=1))])
+        return {row["episode_slug"]: row["progress"] for row in await buffer._take(4)}
+
+    assert asyncio.run(scenario()) == {None: 5.0, "tap-1": 8.0}
+
+
+def test_cancelled_flush_puts_heartbeats_back(monkeypatch):
+    """A timeout between taking and writing a user's rows loses nothing"""
+    monkeypatch.setattr(cache, "redis_client", None)
+
+    async def slow_write(db, rows):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(watch_service, "bulk_upsert_watch_history", slow_write)
+
+    async def scenario():
+        buffer = watch_service.ProgressBuffer()
+        await buffer.add(
+            5, WatchHistoryCreate(movie_slug="movie", movie_name="Movie", progress=3.0)
+        )
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(buffer.flush_user(db, 5), 0.05)
+        await async_engine.dispose()
+        return [row["progress"] for row in await buffer._take(5)]
+
+    assert asyncio.run(scenario()) == [3.0]